@@ -1,62 +1,86 @@
 import logging
 from homeassistant.config_entries import ConfigEntry
-from homeassistant.core import HomeAssistant
-from homeassistant.helpers import entity_registry as er, device_registry as dr
-from .const import DOMAIN, CONF_HOST, CONF_PORT, CONF_PASSWORD, CONF_DOORS, CONF_AREAS, CONF_INPUTS, CONF_OUTPUTS
-from .ict_library import ICTClient
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers import config_validation as cv, entity_registry as er, device_registry as dr
+from homeassistant.helpers.dispatcher import async_dispatcher_connect, async_dispatcher_send
+from homeassistant.helpers.storage import Store
+from .const import (
+    DOMAIN, CONF_HOST, CONF_PORT, CONF_PASSWORD, CONF_DOORS, CONF_AREAS, CONF_INPUTS, CONF_OUTPUTS,
+    CONF_OPTIMISTIC, CONF_POLL_FRESHNESS, STORAGE_VERSION, STATE_SAVE_DELAY
+)
+from .ict_library import ICTClient, POLL_FRESHNESS
+from .sensor import METRICS
+from .services import async_setup_services
 
 _LOGGER = logging.getLogger(__name__)
-PLATFORMS = ["lock", "binary_sensor", "switch", "alarm_control_panel", "select"]
+PLATFORMS = ["lock", "binary_sensor", "switch", "alarm_control_panel", "select", "sensor"]
+CONFIG_SCHEMA = cv.config_entry_only_config_schema(DOMAIN)
 
-async def async_setup(hass: HomeAssistant, config: dict) -> bool: return True
+async def async_setup(hass: HomeAssistant, config: dict) -> bool:
+    async_setup_services(hass)
+    return True
 
 async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     hass.data.setdefault(DOMAIN, {})
     
-    client = ICTClient(entry.data[CONF_HOST], entry.data[CONF_PORT], entry.data.get(CONF_PASSWORD))
+    client = ICTClient(
+        entry.data[CONF_HOST], entry.data[CONF_PORT], entry.data.get(CONF_PASSWORD),
+        poll_freshness=entry.options.get(CONF_POLL_FRESHNESS, POLL_FRESHNESS),
+        optimistic=entry.options.get(CONF_OPTIMISTIC, False)
+    )
+    client.set_configuration(**_configured_ids(entry.options))
+    
+    # Restore the last known states so entities start with real values, flagged stale until the panel confirms them
+    store = _state_store(hass, entry)
+    client.restore_states(await store.async_load())
+    entry.async_on_unload(client.register_callback(
+        lambda update: store.async_delay_save(client.snapshot_states, STATE_SAVE_DELAY)
+    ))
+    # Runs after async_unload_entry has stopped the client, replacing any pending delayed save
+    entry.async_on_unload(lambda: store.async_save(client.snapshot_states()))
 
+    await client.start()
+    hass.data[DOMAIN][entry.entry_id] = client
+    await hass.config_entries.async_forward_entry_setups(entry, PLATFORMS)
+    entry.async_on_unload(entry.add_update_listener(async_options_updated))
+    _async_remove_orphans(hass, entry)
+    return True
+
+def _configured_ids(options):
     def get_ids(key):
-        d = entry.options.get(key, {})
+        d = options.get(key, {})
         if isinstance(d, dict): return [int(k) for k in d.keys()]
         return []
+    return {"doors": get_ids(CONF_DOORS), "areas": get_ids(CONF_AREAS), "inputs": get_ids(CONF_INPUTS), "outputs": get_ids(CONF_OUTPUTS)}
 
-    door_ids = get_ids(CONF_DOORS)
-    area_ids = get_ids(CONF_AREAS)
-    input_ids = get_ids(CONF_INPUTS)
-    output_ids = get_ids(CONF_OUTPUTS)
+@callback
+def _async_remove_orphans(hass: HomeAssistant, entry: ConfigEntry):
+    ids = _configured_ids(entry.options)
 
-    client.set_configuration(
-        doors=door_ids,
-        areas=area_ids,
-        inputs=input_ids,
-        outputs=output_ids
-    )
-    
-    await client.start()
-    hass.data[DOMAIN][entry.entry_id] = client
-    await hass.config_entries.async_forward_entry_setups(entry, PLATFORMS)
-    entry.async_on_unload(entry.add_update_listener(async_reload_entry))
-    
     # --- GARBAGE COLLECTOR (Entities) ---
     ent_reg = er.async_get(hass)
     valid_unique_ids = set()
     
     # 1. Build list of valid Entity IDs
-    for d in door_ids:
+    for d in ids["doors"]:
         valid_unique_ids.add(f"ict_door_{d}")
         valid_unique_ids.add(f"ict_door_contact_{d}")
         
-    for a in area_ids:
+    for a in ids["areas"]:
         valid_unique_ids.add(f"ict_area_{a}")
 
-    for i in input_ids:
+    for i in ids["inputs"]:
         valid_unique_ids.add(f"ict_input_{i}")
         valid_unique_ids.add(f"ict_input_bypass_{i}")
         valid_unique_ids.add(f"ict_trouble_{i}") 
 
-    for o in output_ids:
+    for o in ids["outputs"]:
         valid_unique_ids.add(f"ict_output_{o}")
 
+    # Diagnostic sensors of the controller itself
+    for key, *_ in METRICS:
+        valid_unique_ids.add(f"ict_metric_{key}")
+
     # Remove Orphaned Entities
     entries_to_remove = []
     for entity in er.async_entries_for_config_entry(ent_reg, entry.entry_id):
@@ -73,10 +97,10 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     valid_device_identifiers = set()
 
     # 2. Build list of valid Device Identifiers
-    for d in door_ids: valid_device_identifiers.add((DOMAIN, f"door_{d}"))
-    for a in area_ids: valid_device_identifiers.add((DOMAIN, f"area_{a}"))
-    for i in input_ids: valid_device_identifiers.add((DOMAIN, f"input_{i}"))
-    for o in output_ids: valid_device_identifiers.add((DOMAIN, f"output_{o}"))
+    for d in ids["doors"]: valid_device_identifiers.add((DOMAIN, f"door_{d}"))
+    for a in ids["areas"]: valid_device_identifiers.add((DOMAIN, f"area_{a}"))
+    for i in ids["inputs"]: valid_device_identifiers.add((DOMAIN, f"input_{i}"))
+    for o in ids["outputs"]: valid_device_identifiers.add((DOMAIN, f"output_{o}"))
     # Note: Controller device is always valid
     valid_device_identifiers.add((DOMAIN, "ict_controller"))
 
@@ -97,10 +121,76 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     for dev_id in devices_to_remove:
         dev_reg.async_remove_device(dev_id)
 
-    return True
+@callback
+def _async_rename_devices(hass: HomeAssistant, entry: ConfigEntry):
+    dev_reg = dr.async_get(hass)
+    for key, prefix in ((CONF_DOORS, "door"), (CONF_AREAS, "area"), (CONF_INPUTS, "input"), (CONF_OUTPUTS, "output")):
+        for dev_id, name in entry.options.get(key, {}).items():
+            device = dev_reg.async_get_device(identifiers={(DOMAIN, f"{prefix}_{dev_id}")})
+            if device and device.name != name: dev_reg.async_update_device(device.id, name=name)
+
+def signal_options_updated(entry: ConfigEntry) -> str:
+    return f"{DOMAIN}_options_updated_{entry.entry_id}"
+
+@callback
+def async_add_configured_entities(hass: HomeAssistant, entry: ConfigEntry, async_add_entities, build):
+    """Add the entities `build(options)` returns, then keep the platform in step with options changes.
+
+    Entities with a new unique ID are added, existing ones pick up a changed name or feature set.
+    Removed ones are deleted from the registry by _async_remove_orphans, which unloads them.
+    """
+    entities = {}
+
+    @callback
+    def _sync(options):
+        ent_reg = er.async_get(hass)
+        new = []
+        wanted = set()
+        for entity in build(options):
+            wanted.add(entity.unique_id)
+            current = entities.get(entity.unique_id)
+            if current is None:
+                entities[entity.unique_id] = entity
+                new.append(entity)
+                continue
+            changed = False
+            for attr in ("_attr_name", "_attr_supported_features"):
+                value = getattr(entity, attr, None)
+                if getattr(current, attr, None) != value:
+                    setattr(current, attr, value)
+                    changed = True
+            if not changed or current.hass is None: continue
+            if current.registry_entry: ent_reg.async_update_entity(current.entity_id, original_name=current._attr_name)
+            current.async_write_ha_state()
+        for unique_id in entities.keys() - wanted: entities.pop(unique_id)
+        if new: async_add_entities(new)
+
+    _sync(entry.options)
+    entry.async_on_unload(async_dispatcher_connect(hass, signal_options_updated(entry), _sync))
+
+async def async_options_updated(hass: HomeAssistant, entry: ConfigEntry):
+    """Apply an options change to the running client and entities without reconnecting.
+
+    Only a change of connection settings needs a reload.
+    """
+    client = hass.data[DOMAIN][entry.entry_id]
+    if (client.host, client.port, client.service_pin) != (entry.data[CONF_HOST], entry.data[CONF_PORT], entry.data.get(CONF_PASSWORD)):
+        await hass.config_entries.async_reload(entry.entry_id)
+        return
+
+    client.optimistic = entry.options.get(CONF_OPTIMISTIC, False)
+    client.poll_freshness = entry.options.get(CONF_POLL_FRESHNESS, POLL_FRESHNESS)
+    _async_remove_orphans(hass, entry)
+    _async_rename_devices(hass, entry)
+    async_dispatcher_send(hass, signal_options_updated(entry), entry.options)
+    await client.update_configuration(**_configured_ids(entry.options))
 
-async def async_reload_entry(hass: HomeAssistant, entry: ConfigEntry):
-    await hass.config_entries.async_reload(entry.entry_id)
+def _state_store(hass: HomeAssistant, entry: ConfigEntry) -> Store:
+    return Store(hass, STORAGE_VERSION, f"{DOMAIN}.{entry.entry_id}.state")
+
+def inventory_store(hass: HomeAssistant, entry: ConfigEntry) -> Store:
+    """Discovery results of the options-flow scanner, see ICTInventory."""
+    return Store(hass, STORAGE_VERSION, f"{DOMAIN}.{entry.entry_id}.inventory")
 
 async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     client = hass.data[DOMAIN][entry.entry_id]
@@ -108,3 +198,7 @@ async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     unload_ok = await hass.config_entries.async_unload_platforms(entry, PLATFORMS)
     if unload_ok: hass.data[DOMAIN].pop(entry.entry_id)
     return unload_ok
+
+async def async_remove_entry(hass: HomeAssistant, entry: ConfigEntry) -> None:
+    await _state_store(hass, entry).async_remove()
+    await inventory_store(hass, entry).async_remove()
@@ -20,23 +20,28 @@ from .const import (
     DOMAIN, CONF_AREAS, 
     CONF_ENABLE_AWAY, CONF_ENABLE_STAY, CONF_ENABLE_NIGHT, CONF_ENABLE_BYPASS
 )
+from . import async_add_configured_entities
 
 _LOGGER = logging.getLogger(__name__)
 
 async def async_setup_entry(hass, entry, async_add_entities):
     client = hass.data[DOMAIN][entry.entry_id]
-    data = entry.options.get(CONF_AREAS, {})
-    
-    # Read User Preferences for Arming Modes (Default to True if not set)
-    enable_away = entry.options.get(CONF_ENABLE_AWAY, True)
-    enable_stay = entry.options.get(CONF_ENABLE_STAY, True)
-    enable_night = entry.options.get(CONF_ENABLE_NIGHT, True)
-    enable_bypass = entry.options.get(CONF_ENABLE_BYPASS, False)
-
-    async_add_entities([
-        ICTArea(client, int(k), v, enable_away, enable_stay, enable_night, enable_bypass) 
-        for k, v in data.items()
-    ])
+
+    def build(options):
+        data = options.get(CONF_AREAS, {})
+
+        # Read User Preferences for Arming Modes (Default to True if not set)
+        enable_away = options.get(CONF_ENABLE_AWAY, True)
+        enable_stay = options.get(CONF_ENABLE_STAY, True)
+        enable_night = options.get(CONF_ENABLE_NIGHT, True)
+        enable_bypass = options.get(CONF_ENABLE_BYPASS, False)
+
+        return [
+            ICTArea(client, int(k), v, enable_away, enable_stay, enable_night, enable_bypass)
+            for k, v in data.items()
+        ]
+
+    async_add_configured_entities(hass, entry, async_add_entities, build)
 
 class ICTArea(AlarmControlPanelEntity):
     def __init__(self, client, area_id, name, enable_away, enable_stay, enable_night, enable_bypass):
@@ -68,41 +73,66 @@ class ICTArea(AlarmControlPanelEntity):
             via_device=(DOMAIN, "ict_controller"),
         )
 
+    @property
+    def assumed_state(self):
+        # True while showing a restored state the panel hasn't confirmed yet
+        return self._client.is_stale("area", self._area_id)
+
     async def async_added_to_hass(self):
-        self._client.register_callback(self._handle_update)
+        cached = self._client.get_state("area", self._area_id)
+        if cached is not None: self._apply_update(cached)
+        self.async_on_remove(self._client.subscribe("area", self._area_id, self._handle_update))
+
+    def _apply_update(self, update):
+        if update.alarm: self._state = STATE_ALARM_TRIGGERED
+        elif update.armed: self._state = STATE_ALARM_ARMED_AWAY
+        else: self._state = STATE_ALARM_DISARMED
 
     @callback
     def _handle_update(self, update):
-        if update["type"] == "area" and update["id"] == self._area_id:
-            if update["alarm"]: self._state = STATE_ALARM_TRIGGERED
-            elif update["armed"]: self._state = STATE_ALARM_ARMED_AWAY
-            else: self._state = STATE_ALARM_DISARMED
-            self.async_write_ha_state()
+        self._apply_update(update)
+        self.async_write_ha_state()
 
     @property
     def state(self): return self._state
 
     async def async_alarm_disarm(self, code=None) -> None:
         if not code: return
-        await self._client.send_command_with_pin(0x02, 0x02, self._area_id, code)
+        await self._async_command(0x02, code, STATE_ALARM_DISARMED)
 
     async def async_alarm_arm_away(self, code=None) -> None:
         if not code: return
         # Standard Force Arm
-        await self._client.send_command_with_pin(0x02, 0x01, self._area_id, code)
+        await self._async_command(0x01, code, STATE_ALARM_ARMED_AWAY)
 
     async def async_alarm_arm_home(self, code=None) -> None:
         if not code: return
         # Stay Arm (Protege "Stay" Mode)
-        await self._client.send_command_with_pin(0x02, 0x03, self._area_id, code)
+        await self._async_command(0x03, code, STATE_ALARM_ARMED_HOME)
 
     async def async_alarm_arm_night(self, code=None) -> None:
         if not code: return
         # Night Arm (Protege "Instant" Mode usually maps well here, or Sleep)
         # Using 0x04 (Instant/Sleep) based on standard automation protocols
-        await self._client.send_command_with_pin(0x02, 0x04, self._area_id, code)
+        await self._async_command(0x04, code, STATE_ALARM_ARMED_NIGHT)
         
     async def async_alarm_arm_vacation(self, code=None) -> None:
         # We use this for "Force Arm" or specific bypass modes if enabled
         if not code: return
-        await self._client.send_command_with_pin(0x02, 0x01, self._area_id, code)
+        await self._async_command(0x01, code, STATE_ALARM_ARMED_AWAY)
+
+    async def _async_command(self, sub, code, target_state):
+        if self._client.optimistic:
+            armed = target_state != STATE_ALARM_DISARMED
+            self._client.expect_state("area", self._area_id, self._rollback, armed=armed)
+            self._state = target_state
+            self.async_write_ha_state()
+        if not await self._client.send_command_with_pin(0x02, sub, self._area_id, code):
+            self._client.reject_expectation("area", self._area_id)
+
+    @callback
+    def _rollback(self):
+        cached = self._client.get_state("area", self._area_id)
+        if cached: self._apply_update(cached)
+        else: self._state = None
+        self.async_write_ha_state()
@@ -4,25 +4,28 @@ from homeassistant.config_entries import ConfigEntry
 from homeassistant.core import callback
 from homeassistant.helpers.entity import DeviceInfo
 from .const import DOMAIN, CONF_INPUTS, CONF_DOORS
+from . import async_add_configured_entities
 
 async def async_setup_entry(hass, entry, async_add_entities):
     client = hass.data[DOMAIN][entry.entry_id]
-    
-    # Process Inputs
-    data_in = entry.options.get(CONF_INPUTS, {})
-    entities = []
-    for k, v in data_in.items():
-        # Create standard Input Entity
-        entities.append(ICTInput(client, int(k), v, "input"))
-        # Automatically create Trouble Entity linked to same ID
-        entities.append(ICTInput(client, int(k), v, "trouble"))
-        
-    # Process Doors
-    data_dr = entry.options.get(CONF_DOORS, {})
-    for k, v in data_dr.items():
-        entities.append(ICTInput(client, int(k), v, "door"))
-        
-    async_add_entities(entities)
+
+    def build(options):
+        # Process Inputs
+        data_in = options.get(CONF_INPUTS, {})
+        entities = []
+        for k, v in data_in.items():
+            # Create standard Input Entity
+            entities.append(ICTInput(client, int(k), v, "input"))
+            # Automatically create Trouble Entity linked to same ID
+            entities.append(ICTInput(client, int(k), v, "trouble"))
+
+        # Process Doors
+        data_dr = options.get(CONF_DOORS, {})
+        for k, v in data_dr.items():
+            entities.append(ICTInput(client, int(k), v, "door"))
+        return entities
+
+    async_add_configured_entities(hass, entry, async_add_entities, build)
 
 class ICTInput(BinarySensorEntity):
     def __init__(self, client, dev_id, name, sensor_type):
@@ -63,17 +66,26 @@ class ICTInput(BinarySensorEntity):
             via_device=(DOMAIN, "ict_controller"),
         )
 
+    @property
+    def assumed_state(self):
+        # True while showing a restored state the panel hasn't confirmed yet
+        return self._client.is_stale(self._type, self._dev_id)
+
     async def async_added_to_hass(self):
-        self._client.register_callback(self._handle_update)
+        cached = self._client.get_state(self._type, self._dev_id)
+        if cached is not None: self._apply_update(cached)
+        self.async_on_remove(self._client.subscribe(self._type, self._dev_id, self._handle_update))
+
+    def _apply_update(self, update):
+        if self._type == "door": self._is_on = update.open
+        else:
+            self._is_on = update.on
+            if self._type == "input": self._attr_extra_state_attributes["status_text"] = update.status
 
     @callback
     def _handle_update(self, update):
-        if update["type"] == self._type and update["id"] == self._dev_id:
-            if self._type == "door": self._is_on = update["open"]
-            else:
-                self._is_on = update["on"]
-                if "status" in update: self._attr_extra_state_attributes["status_text"] = update["status"]
-            self.async_write_ha_state()
+        self._apply_update(update)
+        self.async_write_ha_state()
 
     @property
     def is_on(self): return self._is_on
@@ -5,12 +5,13 @@ from homeassistant.helpers import selector, entity_registry as er
 from .const import (
     DOMAIN, CONF_HOST, CONF_PORT, CONF_PASSWORD, 
     CONF_DOORS, CONF_AREAS, CONF_INPUTS, CONF_OUTPUTS,
-    CONF_ENABLE_AWAY, CONF_ENABLE_STAY, CONF_ENABLE_NIGHT, CONF_ENABLE_BYPASS
+    CONF_ENABLE_AWAY, CONF_ENABLE_STAY, CONF_ENABLE_NIGHT, CONF_ENABLE_BYPASS, CONF_OPTIMISTIC,
+    CONF_POLL_FRESHNESS
 )
-from .ict_library import ICTClient
+from .ict_library import ICTClient, ICTInventory, POLL_FRESHNESS, POLL_INTERVAL
+from . import inventory_store
 import logging
 import yaml
-import asyncio
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -46,9 +47,13 @@ class ICTOptionsFlowHandler(config_entries.OptionsFlow):
         self.options.setdefault(CONF_ENABLE_STAY, True)
         self.options.setdefault(CONF_ENABLE_NIGHT, True)
         self.options.setdefault(CONF_ENABLE_BYPASS, False)
+        self.options.setdefault(CONF_OPTIMISTIC, False)
+        self.options.setdefault(CONF_POLL_FRESHNESS, POLL_FRESHNESS)
         
         self._edit_type = None
         self._edit_id = None
+        self._scan_plan = []
+        self._scan_task = None
 
     def _get_dict(self, key):
         data = self.options.get(key, {})
@@ -60,7 +65,7 @@ class ICTOptionsFlowHandler(config_entries.OptionsFlow):
 
     async def async_step_init(self, user_input=None):
         return self.async_show_menu(step_id="init", menu_options=[
-            "scan_devices", "configure_arming", "configure_connection",
+            "scan_devices", "configure_arming", "configure_behaviour", "configure_connection",
             "add_door", "add_area", "add_input", "add_output", 
             "edit_device", "remove_device", "raw_editor"
         ])
@@ -82,6 +87,22 @@ class ICTOptionsFlowHandler(config_entries.OptionsFlow):
             })
         )
 
+    # --- ENTITY BEHAVIOUR ---
+    async def async_step_configure_behaviour(self, user_input=None):
+        if user_input is not None:
+            self.options.update(user_input)
+            self._save_options()
+            return self.async_create_entry(title="", data=self.options)
+
+        return self.async_show_form(
+            step_id="configure_behaviour",
+            data_schema=vol.Schema({
+                vol.Required(CONF_OPTIMISTIC, default=self.options.get(CONF_OPTIMISTIC, False)): bool,
+                vol.Required(CONF_POLL_FRESHNESS, default=self.options.get(CONF_POLL_FRESHNESS, POLL_FRESHNESS)):
+                    vol.All(int, vol.Range(min=POLL_INTERVAL, max=86400)),
+            })
+        )
+
     # --- RAW YAML EDITOR ---
     async def async_step_raw_editor(self, user_input=None):
         errors = {}
@@ -228,13 +249,17 @@ class ICTOptionsFlowHandler(config_entries.OptionsFlow):
 
     # --- SCANNER ---
     async def async_step_scan_devices(self, user_input=None):
-        return self.async_show_menu(step_id="scan_devices", menu_options=["scan_all", "scan_doors", "scan_areas", "scan_inputs", "scan_outputs", "back"])
+        return self.async_show_menu(step_id="scan_devices", menu_options=["scan_all", "scan_doors", "scan_areas", "scan_inputs", "scan_outputs", "scan_forget", "back"])
+
+    async def async_step_scan_forget(self, user_input=None):
+        await inventory_store(self.hass, self._config_entry).async_remove()
+        return self.async_abort(reason="scan_forgotten")
 
     async def async_step_scan_all(self, user_input=None):
         if user_input: return await self._execute_scan_logic(user_input["limit_areas"], user_input["limit_doors"], user_input["limit_outputs"], user_input["limit_inputs"])
         return self.async_show_form(step_id="scan_all", data_schema=vol.Schema({
             vol.Required("limit_areas", default=10): int, vol.Required("limit_doors", default=20): int,
-            vol.Required("limit_outputs", default=20): int, vol.Required("limit_inputs", default=100): int,
+            vol.Required("limit_outputs", default=20): int, vol.Required("limit_inputs", default=512): int,
         }))
 
     async def async_step_scan_doors(self, user_input=None):
@@ -245,48 +270,97 @@ class ICTOptionsFlowHandler(config_entries.OptionsFlow):
         return self.async_show_form(step_id="scan_areas", data_schema=vol.Schema({vol.Required("limit", default=10): int}))
     async def async_step_scan_inputs(self, user_input=None):
         if user_input: return await self._execute_scan_logic(limit_inputs=user_input["limit"])
-        return self.async_show_form(step_id="scan_inputs", data_schema=vol.Schema({vol.Required("limit", default=100): int}))
+        return self.async_show_form(step_id="scan_inputs", data_schema=vol.Schema({vol.Required("limit", default=512): int}))
     async def async_step_scan_outputs(self, user_input=None):
         if user_input: return await self._execute_scan_logic(limit_outputs=user_input["limit"])
         return self.async_show_form(step_id="scan_outputs", data_schema=vol.Schema({vol.Required("limit", default=20): int}))
 
     async def _execute_scan_logic(self, limit_doors=0, limit_areas=0, limit_inputs=0, limit_outputs=0):
+        self._scan_plan = [
+            (group, limit, name_prefix, conf_key) for group, limit, name_prefix, conf_key in (
+                (2, limit_areas, "Area", CONF_AREAS), (1, limit_doors, "Door", CONF_DOORS),
+                (3, limit_outputs, "Output", CONF_OUTPUTS), (4, limit_inputs, "Input", CONF_INPUTS),
+            ) if limit > 0
+        ]
+        return await self.async_step_scan_progress()
+
+    async def async_step_scan_progress(self, user_input=None):
+        if self._scan_task is None:
+            self._scan_task = self.hass.async_create_task(self._async_scan())
+        if not self._scan_task.done():
+            return self.async_show_progress(step_id="scan_progress", progress_action="scanning", progress_task=self._scan_task)
+        return self.async_show_progress_done(next_step_id="scan_finish")
+
+    async def async_step_scan_finish(self, user_input=None):
+        task, self._scan_task = self._scan_task, None
+        error = task.exception() or task.result()
+        if isinstance(error, Exception):
+            _LOGGER.error(f"Device scan failed: {error}")
+            error = "unknown"
+        if error: return self.async_abort(reason=error)
+        self._save_options()
+        return self.async_create_entry(title="", data=self.options)
+
+    async def _async_scan(self):
+        """Probe the planned ranges and merge the hits into the options. Returns an abort reason or None.
+
+        Indices answered by an earlier scan are taken from the stored inventory until they expire,
+        so a rescan of an unchanged site doesn't need the controller at all.
+        """
+        store = inventory_store(self.hass, self._config_entry)
+        inventory = ICTInventory()
+        inventory.restore(await store.async_load())
+        plan = []
+        for group, limit, name_prefix, conf_key in self._scan_plan:
+            # Indices already configured are known to exist
+            storage = self._get_dict(conf_key)
+            pending = inventory.pending(group, [i for i in range(1, limit + 1) if i not in storage])
+            plan.append((group, limit, name_prefix, conf_key, pending))
+        total = sum(len(pending) for *_, pending in plan)
+
+        if total:
+            error = await self._probe_pending(inventory, plan, total)
+            await store.async_save(inventory.snapshot())
+            if error: return error
+        for group, limit, name_prefix, conf_key, _ in plan:
+            storage = self._get_dict(conf_key)
+            new = [i for i in inventory.found(group, range(1, limit + 1)) if i not in storage]
+            for i in new: storage[i] = f"{name_prefix} {i}"
+            self.options[conf_key] = storage
+            _LOGGER.info(f"Scan found {len(new)} new {name_prefix.lower()}s in 1-{limit}")
+        return None
+
+    async def _probe_pending(self, inventory, plan, total):
         client = None
         is_temp = False
         if DOMAIN in self.hass.data and self._config_entry.entry_id in self.hass.data[DOMAIN]:
             client = self.hass.data[DOMAIN][self._config_entry.entry_id]
         if not client:
             client = ICTClient(self.data[CONF_HOST], self.data[CONF_PORT], self.data[CONF_PASSWORD])
-            if not await client.start_temp_connection(): return self.async_abort(reason="cannot_connect")
+            if not await client.start_temp_connection(): return "cannot_connect"
             is_temp = True
-        if not await client.authenticate():
+        try:
+            if not await client.authenticate(): return "invalid_auth"
+            offset = 0
+            for group, _, _, _, pending in plan:
+                if pending: await self._run_scan(client, group, pending, offset, total, inventory)
+                offset += len(pending)
+        finally:
             if is_temp: await client.stop()
-            return self.async_abort(reason="invalid_auth")
-            
-        if limit_areas > 0: await self._run_scan(client, 2, limit_areas, self._get_dict(CONF_AREAS), "Area", CONF_AREAS)
-        if limit_doors > 0: await self._run_scan(client, 1, limit_doors, self._get_dict(CONF_DOORS), "Door", CONF_DOORS)
-        if limit_outputs > 0: await self._run_scan(client, 3, limit_outputs, self._get_dict(CONF_OUTPUTS), "Output", CONF_OUTPUTS)
-        if limit_inputs > 0: await self._run_scan(client, 4, limit_inputs, self._get_dict(CONF_INPUTS), "Input", CONF_INPUTS)
-        
-        if is_temp: await client.stop()
-        self._save_options()
-        return self.async_create_entry(title="", data=self.options)
+        return None
 
-    async def _run_scan(self, client, group, limit, storage, name_prefix, conf_key):
-        consecutive_fails = 0
-        for i in range(1, limit + 1):
-            if i in storage: 
-                consecutive_fails = 0
-                continue
-            exists = await client.check_exists(group, i)
-            await asyncio.sleep(0.1)
-            if exists:
-                storage[i] = f"{name_prefix} {i}"
-                consecutive_fails = 0
-            else:
-                consecutive_fails += 1
-                if consecutive_fails >= 5: break
-        self.options[conf_key] = storage
+    async def _run_scan(self, client, group, indices, offset, total, inventory):
+        reported = 0
+
+        def progress(done, count, found):
+            nonlocal reported
+            # Only push whole-percent steps to the frontend
+            percent = int(100 * (offset + done) / total)
+            if percent > reported:
+                reported = percent
+                self.async_update_progress(percent / 100)
+
+        await client.discover(group, indices, progress, inventory=inventory)
 
     async def async_step_configure_connection(self, user_input=None):
         if user_input is not None:
@@ -16,3 +16,12 @@ CONF_ENABLE_AWAY = "enable_arm_away"
 CONF_ENABLE_STAY = "enable_arm_stay"
 CONF_ENABLE_NIGHT = "enable_arm_night"
 CONF_ENABLE_BYPASS = "enable_arm_bypass"
+
+# Entities show a commanded state straight away and roll back if the panel doesn't confirm it
+CONF_OPTIMISTIC = "optimistic"
+# Seconds a point may go unheard before the safety poll queries it
+CONF_POLL_FRESHNESS = "poll_freshness"
+
+# Warm-start snapshot of the last known point states
+STORAGE_VERSION = 1
+STATE_SAVE_DELAY = 30
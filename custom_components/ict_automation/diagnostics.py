@@ -0,0 +1,17 @@
+from homeassistant.components.diagnostics import async_redact_data
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import HomeAssistant
+from .const import DOMAIN, CONF_PASSWORD
+
+TO_REDACT = {CONF_PASSWORD}
+
+async def async_get_config_entry_diagnostics(hass: HomeAssistant, entry: ConfigEntry) -> dict:
+    client = hass.data[DOMAIN][entry.entry_id]
+    return {
+        "entry": async_redact_data(entry.as_dict(), TO_REDACT),
+        "metrics": client.metrics_snapshot(),
+        "monitored_points": len(set(client.monitored_items)),
+        "known_states": len(client.states),
+        "stale_states": len(client.states.stale),
+        "last_poll_sweep": client.last_poll_sweep,
+    }
@@ -1,7 +1,14 @@
 import asyncio
+import bisect
+import heapq
 import logging
+import math
+import os
+import random
 import struct
 import socket
+import time
+from collections import deque, namedtuple
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -9,27 +16,1033 @@ PKT_TYPE_COMMAND = 0x00
 PKT_TYPE_DATA = 0x01
 PKT_TYPE_SYSTEM = 0xC0
 
+REQUEST_TIMEOUT = 2.0
+# Without "Ack Commands" only a NAK answers a command, so silence for this long (or a few RTTs) means success
+NAK_WINDOW = 0.2
+# 'IC' + length + type/encryption + group/sub + checksum
+FRAME_OVERHEAD = 9
+MAX_FRAME_SIZE = 256
+# Anything claiming to be longer than this is a corrupt header, not a packet worth waiting for
+MAX_RX_FRAME_SIZE = MAX_FRAME_SIZE
+
+MONITOR_RECORD = struct.Struct('<BBIBB')
+# 'IC', length, packet type, encryption, group, sub
+FRAME_HEADER = struct.Struct('<2sHBBBB')
+
+# Queued frames are written together at the end of the event-loop tick, or as soon as this many bytes are waiting
+WRITE_FLUSH_SIZE = 4096
+
+# Command priority classes, lower runs first
+PRIORITY_HIGH = 0
+PRIORITY_NORMAL = 1
+# Area arm/disarm and door commands jump ahead of output and bypass traffic
+COMMAND_PRIORITIES = {0x01: PRIORITY_HIGH, 0x02: PRIORITY_HIGH}
+# Bulk commands run this many to a session, so more urgent ones can cut in between
+BULK_CHUNK = 8
+
+# How long an optimistic state may wait for the panel to confirm it
+OPTIMISTIC_TIMEOUT = 10.0
+
+# Probe the link after this much inbound silence; a reader hearing nothing for READ_DEADLINE gives up on it
+KEEPALIVE_IDLE = 5.0
+READ_DEADLINE = KEEPALIVE_IDLE + 2 * REQUEST_TIMEOUT
+# Queried on an idle link with nothing monitored; a panel without this record still NAKs the query
+PROBE_RECORD = (0x00, 0x02, 1)
+# Reconnect backoff: full jitter between half and all of min(cap, base * 2^attempt)
+RECONNECT_BASE = 0.5
+RECONNECT_CAP = 60.0
+# A connection that lasted this long earns an immediate reconnect when it ends
+STABLE_CONNECTION = 30.0
+
+# Send rate limits (packets per second); the limiter starts at RATE_INITIAL and tunes itself from replies
+RATE_INITIAL = 50.0
+RATE_MIN = 5.0
+RATE_MAX = 1000.0
+RATE_BURST = 16
+
+# Concurrent status queries while discovering records
+DISCOVERY_WINDOW = 32
+# Discovery answers older than this are probed again on the next scan
+INVENTORY_MAX_AGE = 7 * 86400
+
+# Upper bounds in seconds of the latency histogram buckets
+METRIC_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+# Decode rates are averaged over at least this many seconds
+METRIC_RATE_WINDOW = 10.0
+
+# Capture files: magic, then (wall time, direction, length) + raw bytes per record
+CAPTURE_MAGIC = b"ICTCAP1\n"
+CAPTURE_RECORD = struct.Struct('<dBH')
+CAPTURE_IN = 0
+CAPTURE_OUT = 1
+CAPTURE_MAX_BYTES = 16 * 1024 * 1024
+CAPTURE_BACKUPS = 3
+CAPTURE_FLUSH_INTERVAL = 1.0
+
+POLL_INTERVAL = 60
+# Share of the interval a safety sweep is spread over, leaving headroom before the next one
+POLL_SPREAD = 0.8
+POLL_MAX_WINDOW = 16
+# Points heard from (push or poll) within this many seconds are skipped by the safety poll
+POLL_FRESHNESS = 600
+
+class DoorUpdate(namedtuple("DoorUpdate", "id locked open")):
+    __slots__ = ()
+    type = "door"
+
+class AreaUpdate(namedtuple("AreaUpdate", "id armed alarm")):
+    __slots__ = ()
+    type = "area"
+
+class OutputUpdate(namedtuple("OutputUpdate", "id on")):
+    __slots__ = ()
+    type = "output"
+
+class InputUpdate(namedtuple("InputUpdate", "id on status bypassed")):
+    __slots__ = ()
+    type = "input"
+
+class TroubleUpdate(namedtuple("TroubleUpdate", "id on")):
+    __slots__ = ()
+    type = "trouble"
+
+INPUT_STATES = ("Closed", "Open", "Short Circuit", "Tamper")
+
+UPDATE_TYPES = {cls.type: cls for cls in (DoorUpdate, AreaUpdate, OutputUpdate, InputUpdate, TroubleUpdate)}
+RECORD_NAMES = {0x01: "door", 0x02: "area", 0x03: "output", 0x04: "input", 0x06: "trouble"}
+
+RECORD_INDEX = struct.Struct('<I')
+# Record type (type_h) -> (layout of the fields we read, builder). Offsets match the panel's status records.
+RECORD_DECODERS = {
+    0x01: (struct.Struct('<IBB'), lambda idx, lock, state: DoorUpdate(idx, lock == 0, state > 0)),
+    0x02: (struct.Struct('<IBxB'), lambda idx, state, flags: AreaUpdate(idx, state >= 0x80, (flags & 0x01) > 0)),
+    0x03: (struct.Struct('<I8xB'), lambda idx, state: OutputUpdate(idx, state > 0)),
+    0x04: (struct.Struct('<I8xBB'), lambda idx, state, flags: InputUpdate(
+        idx, state > 0, INPUT_STATES[state] if state < len(INPUT_STATES) else "Closed", (flags & 0x01) > 0)),
+    0x06: (struct.Struct('<I12xB'), lambda idx, state: TroubleUpdate(idx, state > 0)),
+}
+
+def decode_record(type_h, data, offset=0, length=None):
+    """Decode one status record body from `data` without copying. Returns None for unknown or short records."""
+    decoder = RECORD_DECODERS.get(type_h)
+    if decoder is None: return None
+    layout, build = decoder
+    if length is None: length = len(data) - offset
+    if length < layout.size: return None
+    return build(*layout.unpack_from(data, offset))
+
+class ICTStateStore:
+    """Last decoded update for every point, keyed by (record_type, index).
+
+    States restored from a snapshot stay flagged stale until the panel reports the point again.
+    """
+    def __init__(self):
+        self._states = {}
+        self.stale = set()
+
+    def __len__(self):
+        return len(self._states)
+
+    def get(self, record_type, index):
+        return self._states.get((record_type, index))
+
+    def is_stale(self, record_type, index):
+        return (record_type, index) in self.stale
+
+    def apply(self, update):
+        """Store `update`. Returns False when it matches what was already known and confirmed."""
+        key = (update.type, update.id)
+        if key in self.stale:
+            self.stale.discard(key)
+            self._states[key] = update
+            return True
+        if self._states.get(key) == update: return False
+        self._states[key] = update
+        return True
+
+    def snapshot(self):
+        """JSON-friendly copy of every known state."""
+        return {"states": [[u.type, *u] for u in self._states.values()]}
+
+    def restore(self, snapshot):
+        """Load a snapshot() as stale states. Live states already known are kept."""
+        for row in (snapshot or {}).get("states", []):
+            try:
+                update = UPDATE_TYPES[row[0]](*row[1:])
+            except (KeyError, TypeError, IndexError): continue
+            key = (update.type, update.id)
+            if key in self._states: continue
+            self._states[key] = update
+            self.stale.add(key)
+
+    def items(self):
+        return self._states.items()
+
+class ICTInventory:
+    """Which record indices exist in each group, and when each index was last probed.
+
+    Lets a rescan skip indices the panel answered recently.
+    """
+    def __init__(self, max_age=INVENTORY_MAX_AGE):
+        self.max_age = max_age
+        self._probed = {}
+
+    def record(self, group, index, exists, now=None):
+        self._probed.setdefault(group, {})[index] = (exists, time.time() if now is None else now)
+
+    def pending(self, group, indices, now=None):
+        """The `indices` never probed, or whose answer has expired."""
+        now = time.time() if now is None else now
+        probed = self._probed.get(group, {})
+        return [i for i in indices if i not in probed or now - probed[i][1] > self.max_age]
+
+    def found(self, group, indices=None):
+        probed = self._probed.get(group, {})
+        return sorted(i for i, (exists, _) in probed.items() if exists and (indices is None or i in indices))
+
+    def clear(self):
+        self._probed.clear()
+
+    def snapshot(self):
+        """JSON-friendly copy as runs of consecutive indices sharing an answer: [first, last, exists, probed_at]."""
+        groups = {}
+        for group, probed in self._probed.items():
+            runs = []
+            for idx in sorted(probed):
+                exists, at = probed[idx]
+                if runs and runs[-1][1] == idx - 1 and runs[-1][2:] == [exists, at]: runs[-1][1] = idx
+                else: runs.append([idx, idx, exists, at])
+            groups[str(group)] = runs
+        return {"groups": groups}
+
+    def restore(self, snapshot):
+        for group, runs in (snapshot or {}).get("groups", {}).items():
+            for run in runs:
+                try:
+                    first, last, exists, at = run
+                    probed = self._probed.setdefault(int(group), {})
+                except (TypeError, ValueError): continue
+                for idx in range(first, last + 1): probed[idx] = (bool(exists), at)
+
+class ICTDispatcher:
+    """Routes decoded updates to the entities listening on a (record_type, index) point."""
+    def __init__(self):
+        self._listeners = {}
+
+    def subscribe(self, record_type, index, callback):
+        key = (record_type, index)
+        self._listeners.setdefault(key, []).append(callback)
+
+        def _unsubscribe():
+            callbacks = self._listeners.get(key)
+            if not callbacks: return
+            try: callbacks.remove(callback)
+            except ValueError: pass
+            if not callbacks: del self._listeners[key]
+        return _unsubscribe
+
+    def dispatch(self, record_type, index, update):
+        callbacks = self._listeners.get((record_type, index))
+        if not callbacks: return
+        for cb in tuple(callbacks): cb(update)
+
+    def listener_count(self):
+        return sum(len(c) for c in self._listeners.values())
+
+def encode_frame(group, sub, data=b''):
+    """Build a command packet: header, group/sub, data and the trailing 8-bit sum."""
+    length = FRAME_OVERHEAD + len(data)
+    frame = bytearray(length)
+    FRAME_HEADER.pack_into(frame, 0, b'IC', length, PKT_TYPE_COMMAND, 0x00, group, sub)
+    frame[8:-1] = data
+    frame[-1] = sum(frame) & 0xFF
+    return frame
+
+class ICTCapture:
+    """Rotating binary log of raw traffic: every chunk read from, and frame written to, the controller.
+
+    The hot path only appends to an in-memory buffer. take() hands the buffered records to
+    write(), which does blocking file I/O and is meant to run in an executor. Files roll over
+    at max_bytes to path.1 ... path.<backups>, always on a record boundary. A file already at
+    path when the capture starts is rolled over the same way rather than overwritten.
+    """
+    def __init__(self, path, max_bytes=CAPTURE_MAX_BYTES, backups=CAPTURE_BACKUPS):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.records = 0
+        self._buffer = bytearray()
+        self._file = None
+        self._size = 0
+
+    def record(self, direction, data):
+        self._buffer += CAPTURE_RECORD.pack(time.time(), direction, len(data))
+        self._buffer += data
+        self.records += 1
+
+    def take(self):
+        data = self._buffer
+        self._buffer = bytearray()
+        return data
+
+    def write(self, data):
+        if not data: return
+        if self._file is None:
+            if os.path.exists(self.path): self._shift()
+            self._open()
+        elif self._size + len(data) > self.max_bytes: self._rotate()
+        self._file.write(data)
+        self._file.flush()
+        self._size += len(data)
+
+    def close(self):
+        try: self.write(self.take())
+        finally:
+            if self._file is not None: self._file.close()
+            self._file = None
+
+    def _open(self):
+        self._file = open(self.path, "wb")
+        self._file.write(CAPTURE_MAGIC)
+        self._size = len(CAPTURE_MAGIC)
+
+    def _rotate(self):
+        self._file.close()
+        self._shift()
+        self._open()
+
+    def _shift(self):
+        for n in range(self.backups - 1, 0, -1):
+            if os.path.exists(f"{self.path}.{n}"): os.replace(f"{self.path}.{n}", f"{self.path}.{n + 1}")
+        if self.backups: os.replace(self.path, f"{self.path}.1")
+
+def read_capture(path):
+    """Yield (wall time, direction, bytes) for every complete record in a capture file."""
+    with open(path, "rb") as f:
+        if f.read(len(CAPTURE_MAGIC)) != CAPTURE_MAGIC: raise ValueError(f"{path} is not an ICT capture")
+        while True:
+            header = f.read(CAPTURE_RECORD.size)
+            if len(header) < CAPTURE_RECORD.size: return
+            at, direction, length = CAPTURE_RECORD.unpack(header)
+            data = f.read(length)
+            # A capture cut off mid-write ends with a partial record
+            if len(data) < length: return
+            yield at, direction, data
+
+async def replay_capture(records, on_packet, speed=None):
+    """Feed the inbound chunks of capture `records` through a fresh ICTFramer and return it.
+
+    speed=None replays as fast as possible, 1.0 in real time, 2.0 twice as fast.
+    """
+    framer = ICTFramer(on_packet)
+    loop = asyncio.get_running_loop()
+    origin = None
+    for at, direction, data in records:
+        if direction != CAPTURE_IN: continue
+        if speed:
+            if origin is None: origin = (loop.time(), at)
+            delay = origin[0] + (at - origin[1]) / speed - loop.time()
+            if delay > 0: await asyncio.sleep(delay)
+        framer.feed(data)
+    return framer
+
+class ICTFramer:
+    """Splits the inbound byte stream into checksum-valid packets.
+
+    Bytes are consumed through an offset cursor and the consumed prefix is dropped once per
+    feed. A bad length or checksum resyncs on the next b"IC" marker, as does a header still
+    waiting for bytes when a complete, valid frame already follows it. `on_packet` receives a
+    memoryview that is only valid for the duration of the call.
+    """
+    def __init__(self, on_packet, max_length=MAX_RX_FRAME_SIZE):
+        self._on_packet = on_packet
+        self._max_length = max_length
+        self._buffer = bytearray()
+        self.packets = 0
+        self.checksum_errors = 0
+        self.resyncs = 0
+
+    def reset(self):
+        self._buffer.clear()
+
+    def feed(self, data):
+        buf = self._buffer
+        buf += data
+        end = len(buf)
+        pos = 0
+        view = memoryview(buf)
+        try:
+            while end - pos >= 4:
+                if buf[pos] != 0x49 or buf[pos + 1] != 0x43:
+                    self.resyncs += 1
+                    found = buf.find(b"IC", pos + 1)
+                    if found < 0:
+                        # Keep a trailing 'I' in case its 'C' is in the next chunk
+                        pos = end - 1 if buf[end - 1] == 0x49 else end
+                        break
+                    pos = found
+                    continue
+                length = buf[pos + 2] | (buf[pos + 3] << 8)
+                if length < FRAME_OVERHEAD - 2 or length > self._max_length:
+                    self.resyncs += 1
+                    pos += 1
+                    continue
+                if end - pos < length:
+                    # A corrupt length must not hold up whole frames already sitting behind it
+                    found = self._next_frame(view, pos + 1, end)
+                    if found < 0: break
+                    self.resyncs += 1
+                    pos = found
+                    continue
+                last = pos + length - 1
+                if sum(view[pos:last]) & 0xFF != buf[last]:
+                    self.checksum_errors += 1
+                    pos += 1
+                    continue
+                self.packets += 1
+                packet = view[pos:pos + length]
+                try: self._on_packet(packet)
+                finally: packet.release()
+                pos += length
+        finally:
+            view.release()
+        if pos: del buf[:pos]
+
+    def _next_frame(self, view, pos, end):
+        """Offset of the first complete, checksum-valid frame in view[pos:end], or -1."""
+        buf = self._buffer
+        while True:
+            pos = buf.find(b"IC", pos, end)
+            if pos < 0 or end - pos < 4: return -1
+            length = buf[pos + 2] | (buf[pos + 3] << 8)
+            if FRAME_OVERHEAD - 2 <= length <= self._max_length and end - pos >= length:
+                last = pos + length - 1
+                if sum(view[pos:last]) & 0xFF == buf[last]: return pos
+            pos += 1
+
+class ICTExpectation:
+    """An optimistic state waiting for the panel to report matching field values."""
+    __slots__ = ("fields", "on_rollback", "timer")
+
+    def __init__(self, fields, on_rollback, timer):
+        self.fields = fields
+        self.on_rollback = on_rollback
+        self.timer = timer
+
+    def matches(self, update):
+        return update is not None and all(getattr(update, k) == v for k, v in self.fields.items())
+
+class ICTCommand:
+    __slots__ = ("group", "sub", "index", "pin", "seq", "waiters")
+
+    def __init__(self, group, sub, index, pin, seq):
+        self.group = group
+        self.sub = sub
+        self.index = index
+        self.pin = pin
+        self.seq = seq
+        self.waiters = []
+
+    def resolve(self, result):
+        for f in self.waiters:
+            if not f.done(): f.set_result(result)
+
+    def fail(self):
+        self.resolve(False)
+
+class ICTBatch:
+    """Bulk (group, sub, index) commands sent with one PIN. `results` grows a chunk at a time."""
+    __slots__ = ("commands", "pin", "seq", "results", "waiters")
+
+    def __init__(self, commands, pin, seq):
+        self.commands = commands
+        self.pin = pin
+        self.seq = seq
+        self.results = []
+        self.waiters = []
+
+    def resolve(self, result):
+        for f in self.waiters:
+            if not f.done(): f.set_result(result)
+
+    def fail(self):
+        self.resolve(self.results + [False] * (len(self.commands) - len(self.results)))
+
+class ICTCommandQueue:
+    """Priority queue of pending commands, coalesced per (group, index).
+
+    A command queued for a point that already has one waiting replaces its target state
+    and keeps its place, so only the latest state is sent and every caller gets that result.
+    Batches run BULK_CHUNK commands at a time and keep their place between chunks, so an
+    urgent command queued behind a long batch waits for one chunk at most.
+    """
+    def __init__(self, execute, execute_batch):
+        self._execute = execute
+        self._execute_batch = execute_batch
+        self._heap = []
+        self._queued = {}
+        self._seq = 0
+        self._worker = None
+
+    def __len__(self):
+        return len(self._queued)
+
+    def submit(self, group, sub, index, pin):
+        key = (group, index)
+        cmd = self._queued.get(key)
+        if cmd is None:
+            self._seq += 1
+            cmd = ICTCommand(group, sub, index, pin, self._seq)
+            self._queued[key] = cmd
+            heapq.heappush(self._heap, (COMMAND_PRIORITIES.get(group, PRIORITY_NORMAL), cmd.seq, key))
+        else:
+            cmd.sub = sub
+            cmd.pin = pin
+        return self._wait(cmd)
+
+    def submit_batch(self, commands, pin):
+        """Queue commands that share `pin`. The future gets a success flag per command."""
+        self._seq += 1
+        batch = ICTBatch(commands, pin, self._seq)
+        key = ("batch", batch.seq)
+        self._queued[key] = batch
+        priority = min(COMMAND_PRIORITIES.get(group, PRIORITY_NORMAL) for group, _, _ in commands)
+        heapq.heappush(self._heap, (priority, batch.seq, key))
+        return self._wait(batch)
+
+    def _wait(self, cmd):
+        future = asyncio.get_running_loop().create_future()
+        cmd.waiters.append(future)
+        if self._worker is None or self._worker.done():
+            self._worker = asyncio.create_task(self._run())
+        return future
+
+    def withdraw(self, group, index, future):
+        """Drop a caller that gave up. A queued command nobody waits for any more is not sent."""
+        cmd = self._queued.get((group, index))
+        if cmd is None or future not in cmd.waiters: return
+        cmd.waiters.remove(future)
+        if not cmd.waiters: del self._queued[(group, index)]
+
+    async def _run(self):
+        while self._heap:
+            priority, seq, key = heapq.heappop(self._heap)
+            cmd = self._queued.get(key)
+            if cmd is None or cmd.seq != seq: continue
+            del self._queued[key]
+            try:
+                if isinstance(cmd, ICTBatch):
+                    done = len(cmd.results)
+                    cmd.results += await self._execute_batch(cmd.commands[done:done + BULK_CHUNK], cmd.pin)
+                    if len(cmd.results) < len(cmd.commands):
+                        # Back in its old place: only commands more urgent than the batch overtake it
+                        self._queued[key] = cmd
+                        heapq.heappush(self._heap, (priority, seq, key))
+                        continue
+                    result = cmd.results
+                else: result = await self._execute(cmd.group, cmd.sub, cmd.index, cmd.pin)
+            except asyncio.CancelledError:
+                # stop() only sees queued commands, so the one in flight is failed here
+                cmd.fail()
+                raise
+            except Exception as e:
+                for f in cmd.waiters:
+                    if not f.done(): f.set_exception(e)
+                continue
+            cmd.resolve(result)
+
+    async def stop(self):
+        if self._worker and not self._worker.done():
+            self._worker.cancel()
+            try: await self._worker
+            except asyncio.CancelledError: pass
+        for cmd in self._queued.values(): cmd.fail()
+        self._queued.clear()
+        self._heap.clear()
+
+class ICTBackoff:
+    """Exponential reconnect delay with jitter."""
+    def __init__(self, base=RECONNECT_BASE, cap=RECONNECT_CAP):
+        self.base = base
+        self.cap = cap
+        self.attempts = 0
+
+    def reset(self):
+        self.attempts = 0
+
+    def next_delay(self):
+        delay = min(self.cap, self.base * (2 ** self.attempts))
+        self.attempts = min(self.attempts + 1, 32)
+        return random.uniform(delay / 2, delay)
+
+class ICTRttEstimator:
+    """Smoothed controller round-trip time, updated from every answered request."""
+    def __init__(self, initial=0.05):
+        self.srtt = initial
+        self.rttvar = initial / 2
+        self.samples = 0
+
+    def sample(self, rtt):
+        if self.samples == 0:
+            self.srtt = rtt
+            self.rttvar = rtt / 2
+        else:
+            self.rttvar += (abs(self.srtt - rtt) - self.rttvar) / 4
+            self.srtt += (rtt - self.srtt) / 8
+        self.samples += 1
+
+class ICTHistogram:
+    """Bucketed distribution of durations in seconds. Quantiles are accurate to a bucket bound."""
+    def __init__(self, bounds=METRIC_BUCKETS):
+        self.bounds = bounds
+        self.buckets = [0] * (len(bounds) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.last = None
+
+    def observe(self, value):
+        self.buckets[bisect.bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.total += value
+        self.last = value
+        if value > self.max: self.max = value
+
+    def quantile(self, q):
+        if not self.count: return None
+        rank = q * self.count
+        seen = 0
+        for bound, n in zip(self.bounds, self.buckets):
+            seen += n
+            if seen >= rank: return min(bound, self.max)
+        return self.max
+
+    def as_dict(self):
+        return {
+            "count": self.count,
+            "mean": self.total / self.count if self.count else None,
+            "p50": self.quantile(0.5),
+            "p95": self.quantile(0.95),
+            "max": self.max,
+            "last": self.last,
+            "buckets": {("+Inf" if i == len(self.bounds) else str(self.bounds[i])): n for i, n in enumerate(self.buckets)},
+        }
+
+class ICTMetrics:
+    """Client counters and histograms, kept across reconnects.
+
+    The hot path only bumps integers; rates are derived when the metrics are read.
+    Framer counters of closed connections are folded in so totals survive a reconnect.
+    """
+    def __init__(self):
+        self.frames = 0
+        self.records = 0
+        self.checksum_errors = 0
+        self.resyncs = 0
+        self.connects = 0
+        self.reconnects = 0
+        self.command_latency = {}
+        self.poll_sweep = ICTHistogram()
+        self.subscription = ICTHistogram()
+        self._mark = None
+        self._rates = {"frames": 0.0, "records": 0.0}
+
+    def observe_command(self, group, seconds):
+        histogram = self.command_latency.get(group)
+        if histogram is None: histogram = self.command_latency[group] = ICTHistogram()
+        histogram.observe(seconds)
+
+    def fold_framer(self, framer):
+        self.frames += framer.packets
+        self.checksum_errors += framer.checksum_errors
+        self.resyncs += framer.resyncs
+
+    def rates(self, frames, records, now=None):
+        """Frames and records decoded per second since the last reading at least METRIC_RATE_WINDOW old."""
+        now = time.monotonic() if now is None else now
+        if self._mark is None:
+            self._mark = (now, frames, records)
+        elif now - self._mark[0] >= METRIC_RATE_WINDOW:
+            then, last_frames, last_records = self._mark
+            self._rates = {"frames": (frames - last_frames) / (now - then), "records": (records - last_records) / (now - then)}
+            self._mark = (now, frames, records)
+        return self._rates
+
+class ICTRateLimiter:
+    """Token bucket shared by every sender, tuned additive-increase / multiplicative-decrease.
+
+    Each prompt reply raises the rate: by 10% until the first cut (slow start), by one
+    packet per second after that. Replies slowing to several times the best
+    RTT seen, timeouts and rejected commands cut it, at most once per round trip, so a
+    burst of bad news is one signal rather than many.
+    """
+    def __init__(self, rate=RATE_INITIAL, burst=RATE_BURST, min_rate=RATE_MIN, max_rate=RATE_MAX):
+        self.rate = rate
+        self.burst = burst
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.min_rtt = None
+        self._tokens = float(burst)
+        self._stamp = time.monotonic()
+        self._last_cut = 0.0
+        self._slow_start = True
+
+    async def acquire(self):
+        while True:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._stamp) * self.rate)
+            self._stamp = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return
+            await asyncio.sleep((1 - self._tokens) / self.rate)
+
+    def on_reply(self, rtt):
+        if self.min_rtt is None or rtt < self.min_rtt: self.min_rtt = rtt
+        if rtt > 4 * max(self.min_rtt, 0.005): self._cut(0.8, rtt)
+        else: self.rate = min(self.max_rate, self.rate * 1.1 if self._slow_start else self.rate + 1)
+
+    def on_timeout(self):
+        self._cut(0.5, self.min_rtt or REQUEST_TIMEOUT)
+
+    def on_reject(self):
+        self._cut(0.8, self.min_rtt or 0.0)
+
+    def _cut(self, factor, hold):
+        now = time.monotonic()
+        if now - self._last_cut < hold: return
+        self._last_cut = now
+        self._slow_start = False
+        self.rate = max(self.min_rate, self.rate * factor)
+
+    def reset(self):
+        # A new connection may reach a different path or a restarted panel
+        self.min_rtt = None
+        self._slow_start = True
+
+class ICTRequest:
+    __slots__ = ("key", "future", "sent")
+
+    def __init__(self, key, future, sent):
+        self.key = key
+        self.future = future
+        self.sent = sent
+
+class ICTRequestTable:
+    """In-flight requests, oldest first.
+
+    The controller answers in order, so ACK/NAK system replies go to the oldest open
+    request that can take them. Status queries are keyed by (record_type, index) and
+    complete on the matching data record, whatever order those arrive in.
+    """
+    def __init__(self, limiter=None):
+        self._order = deque()
+        self._by_key = {}
+        self.rtt = ICTRttEstimator()
+        self.limiter = limiter
+
+    def __len__(self):
+        return sum(1 for r in self._order if not r.future.done())
+
+    def add(self, key=None):
+        loop = asyncio.get_running_loop()
+        req = ICTRequest(key, loop.create_future(), loop.time())
+        self._order.append(req)
+        if key is not None: self._by_key.setdefault(key, deque()).append(req)
+        return req
+
+    def discard(self, req):
+        if not req.future.done(): req.future.cancel()
+        pending = self._by_key.get(req.key)
+        if pending is not None:
+            try: pending.remove(req)
+            except ValueError: pass
+            if not pending: del self._by_key[req.key]
+        self._compact()
+
+    def resolve_ack(self, success):
+        # An ACK only completes commands; a NAK can also reject a status query
+        for req in self._order:
+            if req.future.done(): continue
+            if success and req.key is not None: continue
+            self._complete(req, success)
+            self._compact()
+            return True
+        self._compact()
+        return False
+
+    def resolve_key(self, key):
+        """Complete the oldest query for `key`. Returns False if nothing was waiting for it."""
+        pending = self._by_key.get(key)
+        if not pending: return False
+        matched = False
+        while pending:
+            req = pending.popleft()
+            if not req.future.done():
+                self._complete(req, True)
+                matched = True
+                break
+        if not pending: del self._by_key[key]
+        self._compact()
+        return matched
+
+    def fail_all(self):
+        for req in self._order:
+            if not req.future.done(): req.future.set_result(None)
+        self._order.clear()
+        self._by_key.clear()
+
+    def _complete(self, req, result):
+        req.future.set_result(result)
+        rtt = req.future.get_loop().time() - req.sent
+        self.rtt.sample(rtt)
+        if self.limiter is None: return
+        # A NAKed status query just means "no such record"; a NAKed command may mean the panel is swamped
+        if result is False and req.key is None: self.limiter.on_reject()
+        else: self.limiter.on_reply(rtt)
+
+    def _compact(self):
+        while self._order and self._order[0].future.done(): self._order.popleft()
+
+class ICTConnection:
+    """One TCP session with the controller. Owns its socket, framer and the task reading it.
+
+    `on_closed(connection)` is called once, whichever side ends the session.
+    """
+    def __init__(self, reader, writer, on_packet, on_closed):
+        self.reader = reader
+        self.writer = writer
+        self.framer = ICTFramer(on_packet)
+        self.capture = None
+        self.closed = False
+        self.last_rx = time.monotonic()
+        self._on_closed = on_closed
+        self._reader_task = None
+        self._pending = []
+        self._pending_size = 0
+        self._flush_handle = None
+
+    @classmethod
+    async def open(cls, host, port, on_packet, on_closed, timeout=10.0):
+        reader, writer = await asyncio.wait_for(asyncio.open_connection(host, port), timeout=timeout)
+        conn = cls(reader, writer, on_packet, on_closed)
+        conn._set_socket_options(writer.get_extra_info('socket'))
+        conn._reader_task = asyncio.create_task(conn._read_loop())
+        return conn
+
+    @staticmethod
+    def _set_socket_options(sock):
+        """Let the kernel spot a dead peer too, as a backstop to the read deadline."""
+        if sock is None: return
+        try:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+            if hasattr(socket, "TCP_KEEPIDLE"): sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_KEEPIDLE, 10)
+            if hasattr(socket, "TCP_KEEPINTVL"): sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_KEEPINTVL, 5)
+            if hasattr(socket, "TCP_KEEPCNT"): sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_KEEPCNT, 3)
+        except OSError as e:
+            _LOGGER.debug(f"Could not set TCP keepalive: {e}")
+
+    async def _read_loop(self):
+        try:
+            while not self.closed:
+                try:
+                    chunk = await asyncio.wait_for(self.reader.read(4096), READ_DEADLINE)
+                except asyncio.TimeoutError:
+                    _LOGGER.warning(f"No data from controller for {READ_DEADLINE:.0f}s, reconnecting")
+                    break
+                if not chunk:
+                    _LOGGER.info("Controller closed the connection")
+                    break
+                self.last_rx = time.monotonic()
+                if self.capture is not None: self.capture.record(CAPTURE_IN, chunk)
+                self.framer.feed(chunk)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            _LOGGER.warning(f"Connection to controller failed: {e}")
+        await self.close()
+
+    def send(self, frame):
+        """Queue a frame for the next flush. Returns True if this call flushed a full batch."""
+        self._pending.append(frame)
+        self._pending_size += len(frame)
+        if self._pending_size >= WRITE_FLUSH_SIZE:
+            self.flush()
+            return True
+        if self._flush_handle is None:
+            self._flush_handle = asyncio.get_running_loop().call_soon(self.flush)
+        return False
+
+    def flush(self):
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        if not self._pending or self.closed: return
+        frames = self._pending
+        self._pending = []
+        self._pending_size = 0
+        if self.capture is not None:
+            for frame in frames: self.capture.record(CAPTURE_OUT, frame)
+        try: self.writer.writelines(frames)
+        except Exception as e:
+            _LOGGER.warning(f"Write to controller failed: {e}")
+            asyncio.ensure_future(self.close())
+
+    async def drain(self):
+        await self.writer.drain()
+
+    async def close(self):
+        if self.closed: return
+        self.closed = True
+        if self._flush_handle is not None: self._flush_handle.cancel()
+        self._pending.clear()
+        task = self._reader_task
+        if task is not None and task is not asyncio.current_task() and not task.done(): task.cancel()
+        self.writer.close()
+        try: await self.writer.wait_closed()
+        except Exception: pass
+        self._on_closed(self)
+
 class ICTClient:
-    def __init__(self, host, port, password):
+    def __init__(self, host, port, password, poll_freshness=POLL_FRESHNESS, optimistic=False):
         self.host = host
         self.port = port
         self.service_pin = password
-        self._reader = None
-        self._writer = None
-        self._connected = False
+        self.poll_freshness = poll_freshness
+        self.optimistic = optimistic
+        self._conn = None
         self._lock = asyncio.Lock()
         self.monitored_items = []
         self._callbacks = []
+        self.dispatcher = ICTDispatcher()
+        self.states = ICTStateStore()
+        self._expectations = {}
+        self._commands = ICTCommandQueue(self._execute_command, self._execute_batch)
         self._shutdown = False
-        self._scan_response = None
-        self._scan_event = asyncio.Event()
-        self._login_event = asyncio.Event()
-        self._login_success = False
-        self._tasks = []
+        self.limiter = ICTRateLimiter()
+        self._requests = ICTRequestTable(self.limiter)
+        self._session_pin = None
+        # Whether the panel ACKs commands, learnt from each connection's login reply; None until then.
+        # Unless it does, at most one keyless request is in flight, see _send_keyless
+        self._acks = None
+        self._nak_window = NAK_WINDOW
+        self._subscribed = set()
+        # Items the panel refused one at a time on this connection, so not resent after every command
+        self._refused = set()
+        self._batch_monitoring = True
+        self.last_poll_sweep = None
+        self.metrics = ICTMetrics()
+        self.capture = None
+        self._capture_task = None
+        self._last_heard = {}
+        self._pushed = set()
+        # Long-lived service tasks (supervisor, poller); finished tasks remove themselves
+        self._tasks = set()
+        self._disconnected = asyncio.Event()
+        self._disconnected.set()
+
+    @property
+    def _connected(self):
+        return self._conn is not None and not self._conn.closed
+
+    @property
+    def send_rate(self):
+        """Current paced send rate in packets per second."""
+        return self.limiter.rate
+
+    @property
+    def framer(self):
+        return self._conn.framer if self._conn is not None else None
+
+    def metrics_snapshot(self):
+        """Current counters, rates, gauges and latency distributions, JSON-friendly."""
+        m = self.metrics
+        framer = self.framer
+        frames = m.frames + (framer.packets if framer else 0)
+        rates = m.rates(frames, m.records)
+        return {
+            "connected": self._connected,
+            "frames": frames,
+            "records": m.records,
+            "frames_per_second": rates["frames"],
+            "records_per_second": rates["records"],
+            "checksum_errors": m.checksum_errors + (framer.checksum_errors if framer else 0),
+            "resyncs": m.resyncs + (framer.resyncs if framer else 0),
+            "connects": m.connects,
+            "reconnects": m.reconnects,
+            "command_queue_depth": len(self._commands),
+            "requests_in_flight": len(self._requests),
+            "send_rate": self.limiter.rate,
+            "rtt": self._requests.rtt.srtt if self._requests.rtt.samples else None,
+            "acks": self._acks,
+            "command_latency": {RECORD_NAMES.get(group, str(group)): h.as_dict() for group, h in m.command_latency.items()},
+            "poll_sweep": m.poll_sweep.as_dict(),
+            "subscription": m.subscription.as_dict(),
+        }
+
+    def _spawn(self, coro):
+        task = asyncio.create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
 
     def register_callback(self, callback):
+        """Listen to every update. Returns a handle that removes the listener."""
         self._callbacks.append(callback)
 
+        def _unsubscribe():
+            if callback in self._callbacks: self._callbacks.remove(callback)
+        return _unsubscribe
+
+    def subscribe(self, record_type, index, callback):
+        """Listen to changes of a single point. Returns a handle that removes the listener."""
+        return self.dispatcher.subscribe(record_type, index, callback)
+
+    def expect_state(self, record_type, index, on_rollback, timeout=OPTIMISTIC_TIMEOUT, **fields):
+        """Track an optimistic state until the panel reports `fields` for the point.
+
+        If it hasn't within `timeout` seconds (and the cached state doesn't match either),
+        `on_rollback` is called so the entity can fall back to the panel's truth.
+        """
+        key = (record_type, index)
+        previous = self._expectations.pop(key, None)
+        if previous: previous.timer.cancel()
+        timer = asyncio.get_running_loop().call_later(timeout, self._expire_expectation, key)
+        self._expectations[key] = ICTExpectation(fields, on_rollback, timer)
+
+    def reject_expectation(self, record_type, index):
+        """Roll back a pending optimistic state now, e.g. because the command was refused."""
+        expectation = self._expectations.pop((record_type, index), None)
+        if expectation is None: return
+        expectation.timer.cancel()
+        expectation.on_rollback()
+
+    def _expire_expectation(self, key):
+        expectation = self._expectations.pop(key, None)
+        if expectation is None: return
+        if not expectation.matches(self.states.get(*key)): expectation.on_rollback()
+
+    def _check_expectation(self, update):
+        key = (update.type, update.id)
+        expectation = self._expectations.get(key)
+        if expectation is None or not expectation.matches(update): return
+        expectation.timer.cancel()
+        del self._expectations[key]
+
+    def get_state(self, record_type, index):
+        """Last known update for a point, or None if the panel hasn't reported it yet."""
+        return self.states.get(record_type, index)
+
+    def is_stale(self, record_type, index):
+        """True while a point's state comes from a restored snapshot rather than the panel."""
+        return self.states.is_stale(record_type, index)
+
+    def snapshot_states(self):
+        return self.states.snapshot()
+
+    def restore_states(self, snapshot):
+        self.states.restore(snapshot)
+
     # UPDATED: 4 Arguments Only
     def set_configuration(self, doors, areas, inputs, outputs):
         self.monitored_items = []
@@ -39,236 +1052,538 @@ class ICTClient:
         for i in inputs: 
             self.monitored_items.append((0x00, 0x04, i)) 
             self.monitored_items.append((0x00, 0x06, i))
+        self._subscribed &= set(self.monitored_items)
+        self._refused &= set(self.monitored_items)
+
+    async def update_configuration(self, doors, areas, inputs, outputs):
+        """Switch a running client to a new point list without reconnecting.
+
+        Added points are subscribed and queried straight away. Removed points just stop being
+        polled: the protocol has no unmonitor request, and their pushes have no listeners left.
+        """
+        previous = set(self.monitored_items)
+        self.set_configuration(doors, areas, inputs, outputs)
+        added = [item for item in dict.fromkeys(self.monitored_items) if item not in previous]
+        if not added or not self._connected: return
+        async with self._lock:
+            await self._update_monitoring()
+        await self._poll_sweep([(type_l, idx) for _, type_l, idx in added], 0)
 
     async def start(self):
         self._shutdown = False
-        self._tasks.append(asyncio.create_task(self._supervisor_loop()))
-        self._tasks.append(asyncio.create_task(self._safety_poll_loop()))
+        self._spawn(self._supervisor_loop())
+        self._spawn(self._safety_poll_loop())
 
     async def start_temp_connection(self):
-        try:
-            _LOGGER.info(f"Connecting to ICT Controller for scan at {self.host}:{self.port}...")
-            self._reader, self._writer = await asyncio.wait_for(
-                asyncio.open_connection(self.host, self.port), timeout=10.0
-            )
-            self._connected = True
-            self._tasks.append(asyncio.create_task(self._listen()))
-            return True
-        except Exception as e:
-            _LOGGER.error(f"Scan connection failed: {e}")
+        _LOGGER.info(f"Connecting to ICT Controller for scan at {self.host}:{self.port}...")
+        if not await self._connect_socket():
+            _LOGGER.error("Scan connection failed")
             return False
+        return True
 
     async def authenticate(self):
         if not self._connected: return False
-        self._login_event.clear()
-        self._login_success = False
-        if not await self._perform_login(self.service_pin): return False
-        try:
-            await asyncio.wait_for(self._login_event.wait(), timeout=2.0)
-            return self._login_success
-        except asyncio.TimeoutError:
-            return True
+        async with self._lock:
+            return await self._ensure_session(self.service_pin)
+
+    async def start_capture(self, path, max_bytes=CAPTURE_MAX_BYTES, backups=CAPTURE_BACKUPS):
+        """Record all raw traffic to a rotating capture file until stop_capture()."""
+        await self.stop_capture()
+        self.capture = ICTCapture(path, max_bytes, backups)
+        if self._conn is not None: self._conn.capture = self.capture
+        self._capture_task = asyncio.create_task(self._capture_loop(self.capture))
+        _LOGGER.info(f"Capturing controller traffic to {path}")
+
+    async def stop_capture(self):
+        capture = self.capture
+        if capture is None: return
+        self.capture = None
+        if self._conn is not None: self._conn.capture = None
+        self._capture_task.cancel()
+        try: await self._capture_task
+        except asyncio.CancelledError: pass
+        await asyncio.get_running_loop().run_in_executor(None, capture.close)
+        _LOGGER.info(f"Captured {capture.records} records to {capture.path}")
+
+    async def _capture_loop(self, capture):
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(CAPTURE_FLUSH_INTERVAL)
+            data = capture.take()
+            if not data: continue
+            try: await loop.run_in_executor(None, capture.write, data)
+            except OSError as e:
+                _LOGGER.error(f"Capture write failed, stopping capture: {e}")
+                self.capture = None
+                if self._conn is not None: self._conn.capture = None
+                try: await loop.run_in_executor(None, capture.close)
+                except OSError: pass
+                return
 
     async def stop(self):
         self._shutdown = True
+        await self.stop_capture()
+        await self._commands.stop()
+        for expectation in self._expectations.values(): expectation.timer.cancel()
+        self._expectations.clear()
+        tasks = list(self._tasks)
+        for t in tasks: t.cancel()
+        if tasks: await asyncio.gather(*tasks, return_exceptions=True)
         await self.disconnect()
 
     async def _supervisor_loop(self):
+        backoff = ICTBackoff()
+        while not self._shutdown:
+            try:
+                await self._supervise(backoff)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                # Never let one bad cycle end reconnection for good
+                _LOGGER.exception("ICT supervisor error")
+                await self.disconnect()
+                await asyncio.sleep(backoff.next_delay())
+
+    async def _supervise(self, backoff):
+        loop = asyncio.get_running_loop()
+        connected_at = None
         while not self._shutdown:
             if not self._connected:
+                if connected_at is not None:
+                    # A link that had been healthy is retried at once; one that keeps dropping backs off
+                    if loop.time() - connected_at >= STABLE_CONNECTION: backoff.reset()
+                    else: await asyncio.sleep(backoff.next_delay())
+                    connected_at = None
+                    if self._shutdown: break
                 _LOGGER.info("Attempting connection to ICT Controller...")
                 if await self._connect_socket():
                     _LOGGER.info("Connected!")
-                    self._tasks.append(asyncio.create_task(self._listen()))
-                    await asyncio.sleep(1)
-                    await self._update_monitoring()
+                    connected_at = loop.time()
+                    if self.metrics.connects: self.metrics.reconnects += 1
+                    self.metrics.connects += 1
+                    async with self._lock:
+                        if not await self._ensure_session(self.service_pin):
+                            _LOGGER.warning("Service PIN login rejected, continuing unauthenticated")
+                        await self._update_monitoring()
+                    self.metrics.subscription.observe(loop.time() - connected_at)
+                    # Confirm restored and possibly missed states now rather than on the next sweep
+                    await self._poll_sweep(self._stale_points(), 0)
                 else:
-                    await asyncio.sleep(10)
+                    delay = backoff.next_delay()
+                    _LOGGER.info(f"Connection failed, retrying in {delay:.1f}s")
+                    await asyncio.sleep(delay)
             else:
-                await asyncio.sleep(15)
-                if self._connected:
-                    try: await self._send_raw(0x00, 0x00, b'')
-                    except: await self.disconnect()
+                conn = self._conn
+                # Wake KEEPALIVE_IDLE after the last inbound data, not on a fixed cycle, so the probe always beats READ_DEADLINE
+                quiet = time.monotonic() - conn.last_rx
+                try:
+                    await asyncio.wait_for(self._disconnected.wait(), max(0.0, KEEPALIVE_IDLE - quiet))
+                except asyncio.TimeoutError:
+                    if self._connected and time.monotonic() - conn.last_rx >= KEEPALIVE_IDLE: await self._probe()
+
+    async def _probe(self):
+        """Draw a reply from an idle link so the reader's deadline only trips on a dead one."""
+        # A status query is always answered (data or NAK); a bare keepalive only when acks are enabled
+        type_h, type_l, idx = self.monitored_items[0] if self.monitored_items else PROBE_RECORD
+        await self._request(type_l, 0x80, struct.pack('<I', idx), key=(type_l, idx))
 
     async def _safety_poll_loop(self):
+        await asyncio.sleep(POLL_INTERVAL)
+        loop = asyncio.get_running_loop()
         while not self._shutdown:
-            await asyncio.sleep(60)
-            if self._connected and self.monitored_items:
-                for (type_h, type_l, idx) in self.monitored_items:
-                    if type_l in [1, 2, 3, 4, 6]:
-                        idx_bytes = struct.pack('<I', idx)
-                        try:
-                            await self._send_raw(type_l, 0x80, idx_bytes)
-                            await asyncio.sleep(0.1)
-                        except: break
+            started = loop.time()
+            try:
+                if self._connected and self.monitored_items:
+                    await self._poll_sweep(self._stale_points(), POLL_INTERVAL * POLL_SPREAD)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                _LOGGER.exception("ICT safety poll error")
+            await asyncio.sleep(max(0, POLL_INTERVAL - (loop.time() - started)))
+
+    def _stale_points(self):
+        """Monitored points not heard from within poll_freshness, most in need of a poll first.
+
+        Unconfirmed restored states lead, then points that have never pushed an update, since
+        polling is their only source; the rest follow oldest-heard first, which surfaces points
+        whose pushes went missing.
+        """
+        now = time.monotonic()
+        restored = self.states.stale
+        stale = []
+        for (type_h, type_l, idx) in dict.fromkeys(self.monitored_items):
+            if type_l not in [1, 2, 3, 4, 6]: continue
+            key = (type_l, idx)
+            heard = self._last_heard.get(key)
+            if heard is not None and now - heard < self.poll_freshness: continue
+            unconfirmed = (RECORD_NAMES[type_l], idx) in restored
+            stale.append((not unconfirmed, key in self._pushed, -math.inf if heard is None else heard, key))
+        stale.sort()
+        return [item[-1] for item in stale]
+
+    async def _poll_sweep(self, points, budget):
+        """Status-query every point, spread evenly over `budget` seconds.
+
+        Queries are paced at budget / len(points). The in-flight window is sized from the
+        measured RTT so the controller can keep up with that pace without the sweep overrunning.
+        A zero budget runs the sweep as fast as the full window allows.
+        """
+        if not points: return
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        spacing = budget / len(points)
+        size = POLL_MAX_WINDOW if spacing <= 0 else math.ceil(self._requests.rtt.srtt / spacing) + 1
+        window = asyncio.Semaphore(max(1, min(POLL_MAX_WINDOW, size)))
+        tasks = []
+        timeouts = 0
+
+        async def _poll(group, idx):
+            nonlocal timeouts
+            try:
+                if await self._request(group, 0x80, struct.pack('<I', idx), key=(group, idx)) is None: timeouts += 1
+            finally: window.release()
+
+        for n, (group, idx) in enumerate(points):
+            if not self._connected: break
+            delay = started + n * spacing - loop.time()
+            if delay > 0: await asyncio.sleep(delay)
+            await window.acquire()
+            tasks.append(asyncio.create_task(_poll(group, idx)))
+        if tasks: await asyncio.gather(*tasks, return_exceptions=True)
+
+        duration = loop.time() - started
+        self.last_poll_sweep = {"points": len(tasks), "duration": duration, "timeouts": timeouts}
+        self.metrics.poll_sweep.observe(duration)
+        if duration > POLL_INTERVAL:
+            _LOGGER.warning(f"Safety poll of {len(tasks)} points took {duration:.1f}s, longer than the {POLL_INTERVAL}s interval")
+        else:
+            _LOGGER.debug(f"Safety poll of {len(tasks)} points took {duration:.1f}s ({timeouts} timeouts)")
 
     async def _connect_socket(self):
+        await self.disconnect()
         try:
-            self._reader, self._writer = await asyncio.wait_for(
-                asyncio.open_connection(self.host, self.port), timeout=10.0
-            )
-            self._connected = True
-            return True
-        except Exception: return False
+            conn = await ICTConnection.open(self.host, self.port, self._handle_packet, self._connection_closed)
+        except Exception as e:
+            _LOGGER.debug(f"Connection to {self.host}:{self.port} failed: {e}")
+            return False
+        self._conn = conn
+        conn.capture = self.capture
+        self.limiter.reset()
+        self._disconnected.clear()
+        self._acks = None
+        self._nak_window = NAK_WINDOW
+        self._subscribed.clear()
+        self._refused.clear()
+        # Firmware may have changed while the link was down
+        self._batch_monitoring = True
+        # Pushes may have been missed while the link was down
+        self._last_heard.clear()
+        return True
+
+    def _connection_closed(self, conn):
+        if conn is not self._conn: return
+        self.metrics.fold_framer(conn.framer)
+        self._conn = None
+        self._disconnected.set()
+        self._session_pin = None
+        self._subscribed.clear()
+        self._requests.fail_all()
 
     async def _update_monitoring(self):
-        if not self.monitored_items: return
-        for (type_h, type_l, idx) in self.monitored_items:
-            payload = bytearray([type_l, type_h]) + struct.pack('<I', idx) + bytearray([0x03, 0x00])
-            await self._send_raw(0x00, 0x05, payload)
-            await asyncio.sleep(0.02) 
+        """Subscribe the monitored items this connection isn't already subscribed to."""
+        pending = sorted(item for item in set(self.monitored_items) if item not in self._subscribed and item not in self._refused)
+        if not pending: return
+        per_frame = (MAX_FRAME_SIZE - FRAME_OVERHEAD) // MONITOR_RECORD.size if self._batch_monitoring else 1
+        rejected = await self._send_monitoring(pending, per_frame)
+        # Logged out, every monitor request is refused whatever it holds
+        if not rejected or self._session_pin is None or not self._connected: return
+        if per_frame > 1:
+            # One bad point NAKs its whole frame, so halve refused frames down to single records before blaming the batching
+            while rejected and per_frame > 1 and self._connected:
+                per_frame = (per_frame + 1) // 2
+                rejected = await self._send_monitoring(rejected, per_frame)
+            if not self._connected: return
+            # Without ACKs a NAK that missed its window may have landed on the wrong frame
+            if not rejected and per_frame == 1 and self._acks is True:
+                # Older firmware only takes one record per monitor request
+                _LOGGER.info("Controller rejected batched monitoring, falling back to one record per packet")
+                self._batch_monitoring = False
+        if not rejected: return
+        _LOGGER.warning(f"Controller refused monitoring of {len(rejected)} points, first {rejected[0]}")
+        self._refused.update(rejected)
+
+    async def _send_monitoring(self, items, per_frame):
+        """Pack items into as few monitor frames as fit, send them and return the rejected items."""
+        batches = [items[i:i + per_frame] for i in range(0, len(items), per_frame)]
+        frames = []
+        for batch in batches:
+            payload = bytearray()
+            for (type_h, type_l, idx) in batch: payload += MONITOR_RECORD.pack(type_l, type_h, idx, 0x03, 0x00)
+            frames.append((0x00, 0x05, payload))
+        results = await self._send_keyless(frames)
+        if not self._connected: return []
+        # Silence means the panel isn't acking, not that it refused, so only a NAK leaves items unsubscribed
+        rejected = []
+        for batch, result in zip(batches, results):
+            if result is False: rejected.extend(batch)
+            else: self._subscribed.update(batch)
+        return rejected
 
     async def check_exists(self, group, idx):
         if not self._connected: return False
-        self._scan_response = None
-        self._scan_event.clear()
-        idx_bytes = struct.pack('<I', idx)
-        await self._send_raw(group, 0x80, idx_bytes)
+        return await self._request(group, 0x80, struct.pack('<I', idx), key=(group, idx)) is True
+
+    async def discover(self, group, indices, progress=None, window=DISCOVERY_WINDOW, inventory=None):
+        """Find which `indices` of a record group exist, keeping `window` probes in flight.
+
+        Every index is probed, so sparse numbering such as expansion-module blocks is not
+        cut short by a run of gaps. Probes that time out get one retry once the rest are done.
+        `progress(done, total, found)` is called as probes complete, and every answer is
+        recorded in `inventory` if given. Returns the found indices, sorted.
+        """
+        indices = list(indices)
+        total = len(indices)
+        found = []
+        silent = []
+        done = 0
+        now = time.time()
+
+        async def _probe(queue, retry):
+            nonlocal done
+            for idx in queue:
+                if not self._connected: return
+                result = await self._request(group, 0x80, struct.pack('<I', idx), key=(group, idx))
+                if result is not None and inventory is not None: inventory.record(group, idx, result is True, now)
+                if result is True: found.append(idx)
+                elif result is None and not retry:
+                    silent.append(idx)
+                    continue
+                done += 1
+                if progress: progress(done, total, len(found))
+
+        for queue, retry in ((indices, False), (silent, True)):
+            if not queue: continue
+            shared = iter(list(queue))
+            await asyncio.gather(*(_probe(shared, retry) for _ in range(min(window, len(queue)))))
+        return sorted(found)
+
+    async def _request(self, group, sub, data, key=None, timeout=REQUEST_TIMEOUT):
+        """Send a packet and wait for its reply.
+
+        Returns True on ACK (or the matching data record when `key` is given), False on NAK
+        and None if the controller stayed silent or the connection dropped. Without a key the
+        request goes through _send_keyless, so the caller must hold _lock.
+        """
+        if key is None: return next(iter(await self._send_keyless([(group, sub, data)], timeout)), None)
+        await self.limiter.acquire()
+        # Nothing may await between registering a request and queueing its frame, or replies would pair up wrongly
+        if not self._connected: return None
+        req = self._requests.add(key)
+        await self._send_raw(group, sub, data)
+        return (await self._collect([req], timeout))[0]
+
+    async def _send_keyless(self, frames, timeout=REQUEST_TIMEOUT):
+        """Send (group, sub, data) frames answered by ACK/NAK and return a result per frame sent. Caller holds _lock.
+
+        Every keyless request goes through here. A NAK pairs with the oldest open keyless
+        request, so until the panel is known to ACK the rest, frames go one at a time and a
+        NAK can only belong to the frame that earned it.
+        """
+        requests = []
+        results = []
+        for group, sub, data in frames:
+            await self.limiter.acquire()
+            if not self._connected: break
+            req = self._requests.add()
+            await self._send_raw(group, sub, data)
+            if self._acks is True: requests.append(req)
+            else: results += await self._collect([req], timeout)
+        return results + await self._collect(requests, timeout)
+
+    async def _collect(self, requests, timeout=REQUEST_TIMEOUT):
+        if not requests: return []
+        futures = [r.future for r in requests]
+        if self._acks is False:
+            # Keyless requests are only ever NAKed here, so don't hold the lock for a reply that won't come.
+            # A NAK later than this is taken for the next one's, so a stray NAK widens the window
+            rtt = self._requests.rtt
+            window = min(timeout, max(self._nak_window, rtt.srtt + 4 * rtt.rttvar))
+            await asyncio.wait(futures, timeout=window)
+            futures = [r.future for r in requests if r.key is not None and not r.future.done()]
+            timeout -= window
+        if futures: await asyncio.wait(futures, timeout=timeout)
+        results = []
+        timed_out = False
+        for req in requests:
+            if req.future.done() and not req.future.cancelled(): results.append(req.future.result())
+            else:
+                self._requests.discard(req)
+                if req.key is None and self._acks is not True:
+                    # Silence is the only answer an ACK-less panel gives, not a sign of congestion
+                    results.append(True if self._acks is False else None)
+                    continue
+                results.append(None)
+                timed_out = True
+        if timed_out and self._connected: self.limiter.on_timeout()
+        return results
+
+    async def send_command(self, group, sub, index_id, timeout=None):
+        return await self._queue_command(group, sub, index_id, self.service_pin, timeout)
+
+    async def send_command_with_pin(self, group, sub, index_id, pin_code, timeout=None):
+        return await self._queue_command(group, sub, index_id, pin_code, timeout)
+
+    async def _queue_command(self, group, sub, index_id, pin, timeout):
+        """Queue a command and wait for it. Returns False if `timeout` seconds pass first."""
+        future = self._commands.submit(group, sub, index_id, pin)
         try:
-            await asyncio.wait_for(self._scan_event.wait(), timeout=2.0)
-            return self._scan_response
-        except asyncio.TimeoutError: return False 
+            return await asyncio.wait_for(asyncio.shield(future), timeout)
+        except asyncio.TimeoutError:
+            self._commands.withdraw(group, index_id, future)
+            _LOGGER.warning(f"Command {group:#04x}/{sub:#04x} for index {index_id} missed its {timeout}s deadline")
+            return False
+
+    async def bulk_bypass(self, indices, sub):
+        """Set the bypass mode (0x00 unbypass, 0x01 temporary, 0x02 permanent) of many inputs."""
+        return await self._queue_batch([(0x04, sub, i) for i in indices], self.service_pin)
+
+    async def bulk_output(self, indices, on):
+        return await self._queue_batch([(0x03, 0x01 if on else 0x00, i) for i in indices], self.service_pin)
+
+    async def bulk_area(self, indices, sub, pin_code):
+        """Arm (0x01 away, 0x03 stay, 0x04 night) or disarm (0x02) several areas with one user PIN."""
+        return await self._queue_batch([(0x02, sub, i) for i in indices], pin_code)
 
-    async def send_command(self, group, sub, index_id):
-        await self._execute_transient(group, sub, index_id, self.service_pin)
+    async def _queue_batch(self, commands, pin):
+        """Run commands through the priority queue, a BULK_CHUNK per session. Returns a success flag per command."""
+        if not commands: return []
+        return await self._commands.submit_batch(commands, pin)
 
-    async def send_command_with_pin(self, group, sub, index_id, pin_code):
-        return await self._execute_transient(group, sub, index_id, pin_code)
+    async def _execute_command(self, group, sub, index_id, pin):
+        return (await self._execute_batch([(group, sub, index_id)], pin))[0]
 
-    async def _execute_transient(self, group, sub, index_id, pin):
+    async def _execute_batch(self, commands, pin):
+        """Send (group, sub, index) commands back-to-back in one session. Returns a success flag per command."""
+        started = time.monotonic()
         async with self._lock:
-            if not self._connected: return False
-            if not await self._perform_login(pin): return False
-            
-            await self._send_raw(group, sub, struct.pack('<I', index_id))
-            await asyncio.sleep(0.3)
-            
-            await self._send_raw(0x00, 0x03, b'') 
-            await asyncio.sleep(0.5)
-            
-            await self._update_monitoring()
-            await asyncio.sleep(0.2)
-            await self._send_raw(group, 0x80, struct.pack('<I', index_id))
-            
-            return True
+            if not self._connected: return [False] * len(commands)
+            if not await self._ensure_session(pin):
+                # A wrong user code must not leave the link logged out and unsubscribed
+                await self._restore_service_session()
+                return [False] * len(commands)
+
+            # Points not subscribed while their command runs won't push the new state, e.g. after a user PIN login
+            unwatched = [(0x00, group, index_id) not in self._subscribed for group, _, index_id in commands]
+            results = await self._send_keyless([(group, sub, struct.pack('<I', index_id)) for group, sub, index_id in commands])
+            results += [False] * (len(commands) - len(results))
+            # Latency as the caller sees it, including waiting for the session
+            elapsed = time.monotonic() - started
+            for (group, _, _), result in zip(commands, results):
+                if result is not None: self.metrics.observe_command(group, elapsed)
+
+            # User PINs are only borrowed for the batch, then the service login and subscriptions are restored
+            await self._restore_service_session()
+
+            queries = []
+            for (group, sub, index_id), result, query in zip(commands, results, unwatched):
+                if result is False:
+                    _LOGGER.warning(f"Controller rejected command {group:#04x}/{sub:#04x} for index {index_id}")
+                elif query:
+                    await self.limiter.acquire()
+                    if not self._connected: break
+                    queries.append(self._requests.add((group, index_id)))
+                    await self._send_raw(group, 0x80, struct.pack('<I', index_id))
+            await self._collect(queries)
+            return [result is not False for result in results]
+
+    async def _restore_service_session(self):
+        """Log in with the service PIN if needed and re-subscribe whatever the session is missing. Caller holds _lock."""
+        if self._connected and await self._ensure_session(self.service_pin): await self._update_monitoring()
+
+    async def _ensure_session(self, pin):
+        """Log in as `pin` unless the connection is already authenticated with it. Caller holds _lock."""
+        pin = str(pin)
+        if self._session_pin == pin: return True
+        if self._session_pin is not None:
+            await self._request(0x00, 0x03, b'')
+            self._session_pin = None
+            # Logging out drops the connection's monitoring subscriptions
+            self._subscribed.clear()
+        # Controllers without "Ack Commands" stay silent on a good login, so only a NAK fails it
+        result = await self._perform_login(pin)
+        if result is False: return False
+        if self._acks is None and self._connected:
+            self._acks = result is True
+            # The NAK window is sized from the RTT, which only answered queries can tell without ACKs
+            if not self._acks and not self._requests.rtt.samples: await self._probe()
+        self._session_pin = pin
+        return True
 
     async def _perform_login(self, pin_code):
-        try:
-            digits = [int(c) for c in str(pin_code) if c.isdigit()]
-            if not digits: return False
-            if len(digits) > 6: digits = digits[:6]
-            payload = bytearray(digits)
-            if len(digits) < 6: payload.append(0xFF)
-            await self._send_raw(0x00, 0x02, payload)
-            return True 
-        except: return False
+        digits = [int(c) for c in str(pin_code) if c.isdigit()]
+        if not digits: return False
+        if len(digits) > 6: digits = digits[:6]
+        payload = bytearray(digits)
+        if len(digits) < 6: payload.append(0xFF)
+        return await self._request(0x00, 0x02, payload)
 
     async def _send_raw(self, group, sub, data):
-        if not self._writer: return
-        payload = bytearray([group, sub]) + data
-        wrapper = bytearray([0x00, 0x00]) + payload 
-        length = 5 + len(wrapper)
-        full = bytearray([0x49, 0x43]) + struct.pack('<H', length) + wrapper
-        full.append(sum(full) % 256)
-        try:
-            self._writer.write(full)
-            await self._writer.drain()
-        except: await self.disconnect()
-
-    async def _listen(self):
-        buffer = bytearray()
-        while self._connected:
-            try:
-                chunk = await self._reader.read(1024)
-                if not chunk: 
-                    await self.disconnect()
-                    break
-                buffer.extend(chunk)
-                while len(buffer) > 4:
-                    if buffer[0] != 0x49 or buffer[1] != 0x43:
-                        del buffer[0]
-                        continue
-                    length = struct.unpack('<H', buffer[2:4])[0]
-                    if len(buffer) < length: break
-                    packet = buffer[:length]
-                    del buffer[:length]
-                    self._handle_packet(packet)
-            except: 
-                await self.disconnect()
-                break
+        conn = self._conn
+        if conn is None or conn.closed: return
+        # Backpressure is applied once per flushed batch rather than per packet
+        if conn.send(encode_frame(group, sub, data)):
+            try: await conn.drain()
+            except Exception as e:
+                _LOGGER.debug(f"Drain to controller failed: {e}")
+                await conn.close()
 
     def _handle_packet(self, packet):
         try:
             pkt_type = packet[4]
-            if not self._login_event.is_set():
-                if pkt_type == PKT_TYPE_SYSTEM and len(packet) >= 8:
-                    if packet[6] == 0xFF and packet[7] == 0xFF: 
-                        self._login_success = False
-                        self._login_event.set()
-                        return
-                    if packet[6] == 0xFF and packet[7] == 0x00:
-                        self._login_success = True
-                        self._login_event.set()
-                        return
-                if pkt_type == PKT_TYPE_DATA:
-                    self._login_success = True
-                    self._login_event.set()
-
-            if self._scan_event and not self._scan_event.is_set():
-                if pkt_type == PKT_TYPE_SYSTEM and len(packet) >= 8: 
-                     if packet[6] == 0xFF and packet[7] == 0xFF:
-                         self._scan_response = False
-                         self._scan_event.set()
-                         return
-                if pkt_type == PKT_TYPE_DATA:
-                     self._scan_response = True
-                     self._scan_event.set()
-                     return
-
-            if pkt_type == PKT_TYPE_DATA: 
-                data_section = packet[6:-1]
-                self._parse_data_stream(data_section)
-        except Exception: pass
+            if pkt_type == PKT_TYPE_SYSTEM and len(packet) >= 8 and packet[6] == 0xFF:
+                if packet[7] == 0x00:
+                    self._acks = True
+                    self._requests.resolve_ack(True)
+                elif not self._requests.resolve_ack(False) and self._acks is False:
+                    self._nak_window = min(REQUEST_TIMEOUT, self._nak_window * 2)
+                    _LOGGER.debug(f"NAK after its request gave up, waiting {self._nak_window:.2f}s for NAKs from now on")
+            elif pkt_type == PKT_TYPE_DATA:
+                # Records sit between the 6-byte header and the checksum
+                self._parse_data_stream(packet, 6, len(packet) - 1)
+        except Exception:
+            _LOGGER.debug(f"Failed to handle packet {bytes(packet).hex()}", exc_info=True)
 
-    def _parse_data_stream(self, data):
-        i = 0
-        while i < len(data) - 3:
+    def _parse_data_stream(self, data, start=0, end=None):
+        if end is None: end = len(data)
+        i = start
+        while i < end - 3:
             type_l = data[i]
             type_h = data[i+1]
             length = data[i+2]
-            body = data[i+3 : i+3+length]
             if type_l == 0xFF and type_h == 0xFF: break
-            self._notify_update(type_l, type_h, body)
+            if i + 3 + length > end: break
+            self._notify_update(type_h, data, i + 3, length)
             i += 3 + length
 
-    def _notify_update(self, type_l, type_h, body):
-        update = {}
+    def _notify_update(self, type_h, data, offset, length):
+        if length < 4: return
         try:
-            idx = struct.unpack('<I', body[0:4])[0]
-            if type_h == 0x01: 
-                is_locked = (body[4] == 0)
-                is_open = (body[5] > 0)
-                update = {"type": "door", "id": idx, "locked": is_locked, "open": is_open}
-            elif type_h == 0x02: update = {"type": "area", "id": idx, "armed": (body[4] >= 0x80), "alarm": ((body[6] & 0x01) > 0)}
-            elif type_h == 0x03: update = {"type": "output", "id": idx, "on": (body[12] > 0)}
-            elif type_h == 0x04: 
-                state_val = body[12]
-                bypassed = (body[13] & 0x01) > 0
-                state_desc = "Closed"
-                if state_val == 1: state_desc = "Open"
-                elif state_val == 2: state_desc = "Short Circuit"
-                elif state_val == 3: state_desc = "Tamper"
-                update = {"type": "input", "id": idx, "on": (state_val > 0), "status": state_desc, "bypassed": bypassed}
-            elif type_h == 0x06: update = {"type": "trouble", "id": idx, "on": (body[16] > 0)}
-            if update:
-                for cb in self._callbacks: cb(update)
-        except: pass
+            idx = RECORD_INDEX.unpack_from(data, offset)[0]
+            key = (type_h, idx)
+            self.metrics.records += 1
+            self._last_heard[key] = time.monotonic()
+            if not self._requests.resolve_key(key): self._pushed.add(key)
+            update = decode_record(type_h, data, offset, length)
+            if update is None: return
+            # Confirmation counts even when the record repeats the cached state
+            if self._expectations: self._check_expectation(update)
+            # Polls mostly confirm what is already known; only changes go out to listeners
+            if not self.states.apply(update): return
+            self.dispatcher.dispatch(update.type, idx, update)
+            for cb in self._callbacks: cb(update)
+        except Exception:
+            _LOGGER.exception(f"Failed to handle record {type_h:#04x}")
 
     async def disconnect(self):
-        for t in self._tasks: 
-            if not t.done(): t.cancel()
-        if self._writer: 
-            self._writer.close()
-            try: await self._writer.wait_closed()
-            except: pass
-        self._connected = False
+        """Close the current connection. Service tasks keep running and will reconnect unless stopped."""
+        if self._conn is not None: await self._conn.close()
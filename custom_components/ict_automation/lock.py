@@ -4,12 +4,16 @@ from homeassistant.config_entries import ConfigEntry
 from homeassistant.core import callback
 from homeassistant.helpers.entity import DeviceInfo
 from .const import DOMAIN, CONF_DOORS
+from . import async_add_configured_entities
 
 async def async_setup_entry(hass, entry, async_add_entities):
     client = hass.data[DOMAIN][entry.entry_id]
-    data = entry.options.get(CONF_DOORS, {})
-    entities = [ICTDoor(client, int(k), v) for k, v in data.items()]
-    async_add_entities(entities)
+
+    def build(options):
+        data = options.get(CONF_DOORS, {})
+        return [ICTDoor(client, int(k), v) for k, v in data.items()]
+
+    async_add_configured_entities(hass, entry, async_add_entities, build)
 
 class ICTDoor(LockEntity):
     def __init__(self, client, door_id, name):
@@ -30,15 +34,24 @@ class ICTDoor(LockEntity):
             via_device=(DOMAIN, "ict_controller"),
         )
 
+    @property
+    def assumed_state(self):
+        # True while showing a restored state the panel hasn't confirmed yet
+        return self._client.is_stale("door", self._door_id)
+
     async def async_added_to_hass(self):
-        self._client.register_callback(self._handle_update)
+        cached = self._client.get_state("door", self._door_id)
+        if cached is not None: self._apply_update(cached)
+        self.async_on_remove(self._client.subscribe("door", self._door_id, self._handle_update))
+
+    def _apply_update(self, update):
+        self._is_locked = update.locked
+        self._is_open = update.open
 
     @callback
     def _handle_update(self, update):
-        if update["type"] == "door" and update["id"] == self._door_id:
-            self._is_locked = update["locked"]
-            self._is_open = update["open"]
-            self.async_write_ha_state()
+        self._apply_update(update)
+        self.async_write_ha_state()
 
     @property
     def is_locked(self): return self._is_locked
@@ -47,7 +60,22 @@ class ICTDoor(LockEntity):
     def is_open(self): return self._is_open
 
     async def async_lock(self, **kwargs):
-        await self._client.send_command(0x01, 0x00, self._door_id)
+        await self._async_set_lock(True, 0x00)
 
     async def async_unlock(self, **kwargs):
-        await self._client.send_command(0x01, 0x02, self._door_id)
\ No newline at end of file
+        await self._async_set_lock(False, 0x02)
+
+    async def _async_set_lock(self, locked, sub):
+        if self._client.optimistic:
+            self._client.expect_state("door", self._door_id, self._rollback, locked=locked)
+            self._is_locked = locked
+            self.async_write_ha_state()
+        if not await self._client.send_command(0x01, sub, self._door_id):
+            self._client.reject_expectation("door", self._door_id)
+
+    @callback
+    def _rollback(self):
+        cached = self._client.get_state("door", self._door_id)
+        if cached: self._apply_update(cached)
+        else: self._is_locked = True
+        self.async_write_ha_state()
\ No newline at end of file
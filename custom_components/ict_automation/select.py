@@ -4,15 +4,19 @@ from homeassistant.config_entries import ConfigEntry
 from homeassistant.core import callback
 from homeassistant.helpers.entity import DeviceInfo, EntityCategory
 from .const import DOMAIN, CONF_INPUTS
+from . import async_add_configured_entities
 
 OPTIONS = ["Unbypassed", "Temporary Bypass", "Permanent Bypass"]
 
 async def async_setup_entry(hass, entry, async_add_entities):
     client = hass.data[DOMAIN][entry.entry_id]
-    data_in = entry.options.get(CONF_INPUTS, {})
-    # Only create input bypasses (Group 4)
-    inputs = [ICTBypassSelect(client, int(k), v) for k, v in data_in.items()]
-    async_add_entities(inputs)
+
+    def build(options):
+        data_in = options.get(CONF_INPUTS, {})
+        # Only create input bypasses (Group 4)
+        return [ICTBypassSelect(client, int(k), v) for k, v in data_in.items()]
+
+    async_add_configured_entities(hass, entry, async_add_entities, build)
 
 class ICTBypassSelect(SelectEntity):
     def __init__(self, client, dev_id, name):
@@ -27,6 +31,7 @@ class ICTBypassSelect(SelectEntity):
         self._attr_current_option = OPTIONS[0]
         self._attr_options = OPTIONS
         self._attr_entity_category = EntityCategory.CONFIG
+        self._restored = False
 
     @property
     def icon(self):
@@ -43,20 +48,51 @@ class ICTBypassSelect(SelectEntity):
             via_device=(DOMAIN, "ict_controller"),
         )
 
+    @property
+    def assumed_state(self):
+        # True while showing a restored state the panel hasn't confirmed yet
+        return self._client.is_stale("input", self._dev_id)
+
     async def async_added_to_hass(self):
-        self._client.register_callback(self._handle_update)
+        cached = self._client.get_state("input", self._dev_id)
+        if cached is not None: self._apply_update(cached)
+        self._restored = self._client.is_stale("input", self._dev_id)
+        self.async_on_remove(self._client.subscribe("input", self._dev_id, self._handle_update))
+
+    def _apply_update(self, update):
+        """Returns True if the selected option changed."""
+        # The status record only carries a bypassed flag, so keep whichever bypass mode was chosen
+        if not update.bypassed: option = OPTIONS[0]
+        elif self._attr_current_option == OPTIONS[0]: option = "Temporary Bypass"
+        else: option = self._attr_current_option
+        if option == self._attr_current_option: return False
+        self._attr_current_option = option
+        return True
 
     @callback
     def _handle_update(self, update):
-        if update["type"] == "input" and update["id"] == self._dev_id:
-            if "bypass_mode" in update:
-                self._attr_current_option = update["bypass_mode"]
-                self.async_write_ha_state()
+        # The panel confirming a restored option unchanged must still clear assumed_state
+        if self._apply_update(update) or self._restored:
+            self._restored = False
+            self.async_write_ha_state()
 
     async def async_select_option(self, option: str) -> None:
         sub_cmd = 0x00
         if option == "Temporary Bypass": sub_cmd = 0x01
         elif option == "Permanent Bypass": sub_cmd = 0x02
-        await self._client.send_command(0x04, sub_cmd, self._dev_id)
-        self._attr_current_option = option
+        if self._client.optimistic:
+            self._client.expect_state("input", self._dev_id, self._rollback, bypassed=(sub_cmd != 0x00))
+            self._attr_current_option = option
+            self.async_write_ha_state()
+        if not await self._client.send_command(0x04, sub_cmd, self._dev_id):
+            self._client.reject_expectation("input", self._dev_id)
+        elif not self._client.optimistic:
+            self._attr_current_option = option
+            self.async_write_ha_state()
+
+    @callback
+    def _rollback(self):
+        cached = self._client.get_state("input", self._dev_id)
+        self._attr_current_option = OPTIONS[0]
+        if cached: self._apply_update(cached)
         self.async_write_ha_state()
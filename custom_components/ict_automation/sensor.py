@@ -0,0 +1,77 @@
+from datetime import timedelta
+from homeassistant.components.sensor import SensorEntity, SensorDeviceClass, SensorStateClass
+from homeassistant.const import UnitOfTime
+from homeassistant.helpers.entity import DeviceInfo, EntityCategory
+from .const import DOMAIN
+
+SCAN_INTERVAL = timedelta(seconds=30)
+
+def _latency(key, quantile="p50"):
+    def value(snapshot):
+        seconds = snapshot[key][quantile]
+        return None if seconds is None else round(seconds * 1000, 1)
+    return value
+
+def _command_latency(snapshot):
+    # Median over every command group, weighted by count
+    groups = snapshot["command_latency"].values()
+    count = sum(h["count"] for h in groups)
+    if not count: return None
+    return round(sum(h["p50"] * h["count"] for h in groups) / count * 1000, 1)
+
+# (key, name, unit, state class, value from ICTClient.metrics_snapshot())
+METRICS = [
+    ("frames_per_second", "Frames Decoded", "frames/s", SensorStateClass.MEASUREMENT, lambda s: round(s["frames_per_second"], 2)),
+    ("records_per_second", "Records Decoded", "records/s", SensorStateClass.MEASUREMENT, lambda s: round(s["records_per_second"], 2)),
+    ("checksum_errors", "Checksum Errors", None, SensorStateClass.TOTAL_INCREASING, lambda s: s["checksum_errors"]),
+    ("resyncs", "Stream Resyncs", None, SensorStateClass.TOTAL_INCREASING, lambda s: s["resyncs"]),
+    ("reconnects", "Reconnects", None, SensorStateClass.TOTAL_INCREASING, lambda s: s["reconnects"]),
+    ("command_queue_depth", "Command Queue Depth", None, SensorStateClass.MEASUREMENT, lambda s: s["command_queue_depth"]),
+    ("send_rate", "Send Rate", "packets/s", SensorStateClass.MEASUREMENT, lambda s: round(s["send_rate"], 1)),
+    ("command_latency", "Command Latency", UnitOfTime.MILLISECONDS, SensorStateClass.MEASUREMENT, _command_latency),
+    ("poll_sweep", "Poll Sweep Duration", UnitOfTime.MILLISECONDS, SensorStateClass.MEASUREMENT, _latency("poll_sweep", "last")),
+    ("subscription", "Subscription Time", UnitOfTime.MILLISECONDS, SensorStateClass.MEASUREMENT, _latency("subscription", "last")),
+]
+
+async def async_setup_entry(hass, entry, async_add_entities):
+    client = hass.data[DOMAIN][entry.entry_id]
+    async_add_entities([ICTMetricSensor(client, *metric) for metric in METRICS], True)
+
+class ICTMetricSensor(SensorEntity):
+    """Protocol client metric, polled from the in-memory counters."""
+    _attr_entity_category = EntityCategory.DIAGNOSTIC
+
+    def __init__(self, client, key, name, unit, state_class, value_fn):
+        self._client = client
+        self._key = key
+        self._value_fn = value_fn
+        self._attr_name = f"ICT {name}"
+        self._attr_unique_id = f"ict_metric_{key}"
+        self._attr_native_unit_of_measurement = unit
+        self._attr_state_class = state_class
+        if unit == UnitOfTime.MILLISECONDS: self._attr_device_class = SensorDeviceClass.DURATION
+
+    @property
+    def device_info(self) -> DeviceInfo:
+        return DeviceInfo(
+            identifiers={(DOMAIN, "ict_controller")},
+            name="ICT Controller",
+            manufacturer="Integrated Control Technology",
+            model="Protege Controller",
+        )
+
+    async def async_update(self):
+        snapshot = self._client.metrics_snapshot()
+        self._attr_native_value = self._value_fn(snapshot)
+        # Latency sensors carry the per-group breakdown, in milliseconds like the state
+        detail = snapshot.get(self._key)
+        if self._key == "command_latency":
+            self._attr_extra_state_attributes = {group: _summary(h) for group, h in detail.items()}
+        elif isinstance(detail, dict):
+            self._attr_extra_state_attributes = _summary(detail)
+
+def _summary(histogram):
+    return {
+        "count": histogram["count"],
+        **{q: None if histogram[q] is None else round(histogram[q] * 1000, 1) for q in ("p50", "p95", "max")},
+    }
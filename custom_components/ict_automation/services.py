@@ -0,0 +1,126 @@
+import logging
+import re
+import voluptuous as vol
+from homeassistant.core import HomeAssistant, ServiceCall
+from homeassistant.exceptions import HomeAssistantError
+from homeassistant.helpers import config_validation as cv, entity_registry as er
+from .const import DOMAIN
+
+_LOGGER = logging.getLogger(__name__)
+
+SERVICE_BULK_BYPASS = "bulk_bypass"
+SERVICE_BULK_OUTPUT = "bulk_output"
+SERVICE_BULK_AREA = "bulk_area"
+SERVICE_START_CAPTURE = "start_capture"
+SERVICE_STOP_CAPTURE = "stop_capture"
+
+ATTR_INDICES = "indices"
+ATTR_CONFIG_ENTRY_ID = "config_entry_id"
+ATTR_MODE = "mode"
+ATTR_STATE = "state"
+ATTR_ACTION = "action"
+ATTR_CODE = "code"
+ATTR_MAX_SIZE = "max_size"
+
+BYPASS_MODES = {"unbypassed": 0x00, "temporary": 0x01, "permanent": 0x02}
+AREA_ACTIONS = {"arm_away": 0x01, "disarm": 0x02, "arm_home": 0x03, "arm_night": 0x04}
+
+# Any entity of a point can be used to target it, e.g. an input's sensor, trouble sensor or bypass select
+INPUT_UID = re.compile(r"^ict_(?:input|input_bypass|trouble)_(\d+)$")
+OUTPUT_UID = re.compile(r"^ict_output_(\d+)$")
+AREA_UID = re.compile(r"^ict_area_(\d+)$")
+
+TARGET_SCHEMA = {
+    vol.Optional("entity_id"): cv.entity_ids,
+    vol.Optional(ATTR_INDICES): vol.All(cv.ensure_list, [vol.Coerce(int)]),
+    vol.Optional(ATTR_CONFIG_ENTRY_ID): cv.string,
+}
+
+BULK_BYPASS_SCHEMA = vol.Schema({
+    **TARGET_SCHEMA,
+    vol.Required(ATTR_MODE): vol.In(list(BYPASS_MODES)),
+})
+BULK_OUTPUT_SCHEMA = vol.Schema({
+    **TARGET_SCHEMA,
+    vol.Required(ATTR_STATE): cv.boolean,
+})
+BULK_AREA_SCHEMA = vol.Schema({
+    **TARGET_SCHEMA,
+    vol.Required(ATTR_ACTION): vol.In(list(AREA_ACTIONS)),
+    vol.Required(ATTR_CODE): cv.string,
+})
+
+CAPTURE_SCHEMA = vol.Schema({
+    vol.Optional(ATTR_CONFIG_ENTRY_ID): cv.string,
+    vol.Optional(ATTR_MAX_SIZE, default=16): vol.All(vol.Coerce(int), vol.Range(min=1, max=1024)),
+})
+STOP_CAPTURE_SCHEMA = vol.Schema({
+    vol.Optional(ATTR_CONFIG_ENTRY_ID): cv.string,
+})
+
+def _resolve_entry_id(hass: HomeAssistant, call: ServiceCall):
+    clients = hass.data.get(DOMAIN, {})
+    entry_id = call.data.get(ATTR_CONFIG_ENTRY_ID)
+    if entry_id is None:
+        if len(clients) != 1: raise HomeAssistantError("config_entry_id is required when more than one controller is set up")
+        entry_id = next(iter(clients))
+    if entry_id not in clients: raise HomeAssistantError(f"ICT controller {entry_id} is not loaded")
+    return entry_id
+
+def _resolve_targets(hass: HomeAssistant, call: ServiceCall, pattern):
+    """Group the call's entities and indices by config entry: {entry_id: [index, ...]}."""
+    clients = hass.data.get(DOMAIN, {})
+    targets = {}
+
+    ent_reg = er.async_get(hass)
+    for entity_id in call.data.get("entity_id", []):
+        entry = ent_reg.async_get(entity_id)
+        match = pattern.match(entry.unique_id) if entry and entry.platform == DOMAIN else None
+        if not match: raise HomeAssistantError(f"{entity_id} is not a matching ICT entity")
+        targets.setdefault(entry.config_entry_id, set()).add(int(match.group(1)))
+
+    indices = call.data.get(ATTR_INDICES, [])
+    if indices:
+        targets.setdefault(_resolve_entry_id(hass, call), set()).update(indices)
+
+    for entry_id in targets:
+        if entry_id not in clients: raise HomeAssistantError(f"ICT controller {entry_id} is not loaded")
+    return {entry_id: sorted(idx) for entry_id, idx in targets.items()}
+
+async def _run_bulk(hass: HomeAssistant, call: ServiceCall, pattern, execute):
+    failed = []
+    for entry_id, indices in _resolve_targets(hass, call, pattern).items():
+        results = await execute(hass.data[DOMAIN][entry_id], indices)
+        failed.extend(idx for idx, ok in zip(indices, results) if not ok)
+    if failed: raise HomeAssistantError(f"Controller rejected {call.service} for indices {failed}")
+
+def async_setup_services(hass: HomeAssistant) -> None:
+    if hass.services.has_service(DOMAIN, SERVICE_BULK_BYPASS): return
+
+    async def bulk_bypass(call: ServiceCall) -> None:
+        sub = BYPASS_MODES[call.data[ATTR_MODE]]
+        await _run_bulk(hass, call, INPUT_UID, lambda client, idx: client.bulk_bypass(idx, sub))
+
+    async def bulk_output(call: ServiceCall) -> None:
+        on = call.data[ATTR_STATE]
+        await _run_bulk(hass, call, OUTPUT_UID, lambda client, idx: client.bulk_output(idx, on))
+
+    async def bulk_area(call: ServiceCall) -> None:
+        sub = AREA_ACTIONS[call.data[ATTR_ACTION]]
+        code = call.data[ATTR_CODE]
+        await _run_bulk(hass, call, AREA_UID, lambda client, idx: client.bulk_area(idx, sub, code))
+
+    async def start_capture(call: ServiceCall) -> None:
+        entry_id = _resolve_entry_id(hass, call)
+        # Rotates to .1, .2 and .3 next to the configuration
+        path = hass.config.path(f"{DOMAIN}_{entry_id}.capture")
+        await hass.data[DOMAIN][entry_id].start_capture(path, max_bytes=call.data[ATTR_MAX_SIZE] * 1024 * 1024)
+
+    async def stop_capture(call: ServiceCall) -> None:
+        await hass.data[DOMAIN][_resolve_entry_id(hass, call)].stop_capture()
+
+    hass.services.async_register(DOMAIN, SERVICE_BULK_BYPASS, bulk_bypass, schema=BULK_BYPASS_SCHEMA)
+    hass.services.async_register(DOMAIN, SERVICE_BULK_OUTPUT, bulk_output, schema=BULK_OUTPUT_SCHEMA)
+    hass.services.async_register(DOMAIN, SERVICE_BULK_AREA, bulk_area, schema=BULK_AREA_SCHEMA)
+    hass.services.async_register(DOMAIN, SERVICE_START_CAPTURE, start_capture, schema=CAPTURE_SCHEMA)
+    hass.services.async_register(DOMAIN, SERVICE_STOP_CAPTURE, stop_capture, schema=STOP_CAPTURE_SCHEMA)
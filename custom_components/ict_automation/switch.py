@@ -4,12 +4,16 @@ from homeassistant.config_entries import ConfigEntry
 from homeassistant.core import callback
 from homeassistant.helpers.entity import DeviceInfo
 from .const import DOMAIN, CONF_OUTPUTS
+from . import async_add_configured_entities
 
 async def async_setup_entry(hass, entry, async_add_entities):
     client = hass.data[DOMAIN][entry.entry_id]
-    data = entry.options.get(CONF_OUTPUTS, {})
-    entities = [ICTOutput(client, int(k), v) for k, v in data.items()]
-    async_add_entities(entities)
+
+    def build(options):
+        data = options.get(CONF_OUTPUTS, {})
+        return [ICTOutput(client, int(k), v) for k, v in data.items()]
+
+    async_add_configured_entities(hass, entry, async_add_entities, build)
 
 class ICTOutput(SwitchEntity):
     def __init__(self, client, dev_id, name):
@@ -29,20 +33,40 @@ class ICTOutput(SwitchEntity):
             via_device=(DOMAIN, "ict_controller"),
         )
 
+    @property
+    def assumed_state(self):
+        # True while showing a restored state the panel hasn't confirmed yet
+        return self._client.is_stale("output", self._dev_id)
+
     async def async_added_to_hass(self):
-        self._client.register_callback(self._handle_update)
+        cached = self._client.get_state("output", self._dev_id)
+        if cached is not None: self._is_on = cached.on
+        self.async_on_remove(self._client.subscribe("output", self._dev_id, self._handle_update))
 
     @callback
     def _handle_update(self, update):
-        if update["type"] == "output" and update["id"] == self._dev_id:
-            self._is_on = update["on"]
-            self.async_write_ha_state()
+        self._is_on = update.on
+        self.async_write_ha_state()
 
     @property
     def is_on(self): return self._is_on
 
     async def async_turn_on(self, **kwargs):
-        await self._client.send_command(0x03, 0x01, self._dev_id)
+        await self._async_switch(True, 0x01)
 
     async def async_turn_off(self, **kwargs):
-        await self._client.send_command(0x03, 0x00, self._dev_id)
\ No newline at end of file
+        await self._async_switch(False, 0x00)
+
+    async def _async_switch(self, on, sub):
+        if self._client.optimistic:
+            self._client.expect_state("output", self._dev_id, self._rollback, on=on)
+            self._is_on = on
+            self.async_write_ha_state()
+        if not await self._client.send_command(0x03, sub, self._dev_id):
+            self._client.reject_expectation("output", self._dev_id)
+
+    @callback
+    def _rollback(self):
+        cached = self._client.get_state("output", self._dev_id)
+        self._is_on = cached.on if cached else False
+        self.async_write_ha_state()
\ No newline at end of file
@@ -0,0 +1,5 @@
+"""Tests drive ict_library against tools/ict_simulator.py, both loaded without Home Assistant."""
+import pathlib
+import sys
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent.parent / "tools"))
@@ -0,0 +1,81 @@
+"""Panels without "Ack Commands" only ever answer a command with a NAK."""
+import asyncio
+
+from _library import load
+from ict_simulator import ICTSimulator
+
+ict = load()
+
+async def _connected(sim, inputs=(), outputs=()):
+    port = await sim.start()
+    client = ict.ICTClient("127.0.0.1", port, "1234")
+    client.set_configuration([], [], inputs, outputs)
+    await client.start()
+    while not client.metrics.subscription.count: await asyncio.sleep(0.01)
+    return client
+
+def test_bulk_results_name_the_rejected_index():
+    async def run():
+        sim = ICTSimulator(inputs=3, acks=False, seed=1)
+        client = await _connected(sim, inputs=range(1, 4))
+        try:
+            results = await client.bulk_bypass([1, 2, 3, 50], 0x01)
+            return results, [sim.points[0x04][idx][1] for idx in (1, 2, 3)]
+        finally:
+            await client.stop()
+            await sim.stop()
+
+    results, bypassed = asyncio.run(run())
+    assert results == [True, True, True, False]
+    assert bypassed == [1, 1, 1]
+
+def test_missing_point_is_not_blamed_on_other_frames():
+    async def run():
+        sim = ICTSimulator(inputs=59, acks=False, seed=1)
+        client = await _connected(sim, inputs=[*range(1, 60), 400])
+        try:
+            session, = sim.sessions
+            return client, set(client._subscribed), set(session.subscribed)
+        finally:
+            await client.stop()
+            await sim.stop()
+
+    client, believed, subscribed = asyncio.run(run())
+    assert client._batch_monitoring
+    assert client._refused == {(0x00, 0x04, 400), (0x00, 0x06, 400)}
+    assert {(type_l, idx) for _, type_l, idx in believed} == subscribed
+    assert len(subscribed) == 118
+
+def test_commands_need_no_ack():
+    async def run():
+        sim = ICTSimulator(outputs=5, acks=False, seed=1)
+        client = await _connected(sim, outputs=range(1, 6))
+        try:
+            started = asyncio.get_running_loop().time()
+            results = [await client.send_command(0x03, n & 1, n % 5 + 1) for n in range(20)]
+            elapsed = asyncio.get_running_loop().time() - started
+            rejected = await client.send_command(0x03, 0x07, 1)
+            return client, results, elapsed, rejected
+        finally:
+            await client.stop()
+            await sim.stop()
+
+    client, results, elapsed, rejected = asyncio.run(run())
+    assert client._acks is False
+    assert all(results) and rejected is False
+    # Each command waits out a NAK window, not the full REQUEST_TIMEOUT
+    assert elapsed < 20 * ict.REQUEST_TIMEOUT / 4
+    assert client.limiter.rate > ict.RATE_MIN
+    assert client.states.get("output", 5).on
+
+def test_nak_window_follows_the_rtt():
+    async def run():
+        sim = ICTSimulator(outputs=2, acks=False, latency=0.3, seed=1)
+        client = await _connected(sim)
+        try:
+            return await client.send_command(0x03, 0x07, 1), await client.send_command(0x03, 0x01, 2)
+        finally:
+            await client.stop()
+            await sim.stop()
+
+    assert asyncio.run(run()) == (False, True)
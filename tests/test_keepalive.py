@@ -0,0 +1,29 @@
+import asyncio
+
+from _library import load
+from ict_simulator import ICTSimulator
+
+ict = load()
+
+def test_sparse_pushes_keep_the_link(monkeypatch):
+    """Pushes a little further apart than KEEPALIVE_IDLE must not let the read deadline trip."""
+    monkeypatch.setattr(ict, "KEEPALIVE_IDLE", 0.5)
+    monkeypatch.setattr(ict, "READ_DEADLINE", 0.9)
+
+    async def run():
+        sim = ICTSimulator(inputs=5, seed=1)
+        port = await sim.start()
+        client = ict.ICTClient("127.0.0.1", port, "1234")
+        client.set_configuration([], [], range(1, 6), [])
+        try:
+            await client.start()
+            while not client.metrics.subscription.count: await asyncio.sleep(0.01)
+            for n in range(6):
+                await asyncio.sleep(1.0)
+                sim.set_point(0x04, 1, n & 1, 0)
+            return client.metrics.connects
+        finally:
+            await client.stop()
+            await sim.stop()
+
+    assert asyncio.run(run()) == 1
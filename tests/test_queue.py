@@ -0,0 +1,28 @@
+import asyncio
+
+from _library import load
+from ict_simulator import ICTSimulator
+
+ict = load()
+
+def test_area_command_overtakes_a_bulk_bypass():
+    async def run():
+        # Without ACKs every command waits out a NAK window, so the batch is slow enough to overtake
+        sim = ICTSimulator(areas=1, inputs=24, acks=False, seed=1)
+        port = await sim.start()
+        client = ict.ICTClient("127.0.0.1", port, "1234")
+        client.set_configuration([], [1], range(1, 25), [])
+        try:
+            await client.start()
+            while not client.metrics.subscription.count: await asyncio.sleep(0.01)
+            bulk = asyncio.create_task(client.bulk_bypass(range(1, 25), 0x01))
+            await asyncio.sleep(0.1)
+            disarmed = await client.send_command(0x02, 0x02, 1)
+            return disarmed, bulk.done(), await bulk
+        finally:
+            await client.stop()
+            await sim.stop()
+
+    disarmed, bulk_done, results = asyncio.run(run())
+    assert disarmed and not bulk_done
+    assert results == [True] * 24
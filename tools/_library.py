@@ -0,0 +1,19 @@
+"""Load ict_library.py on its own, without the Home Assistant package around it.
+
+Putting the integration directory on sys.path would let its select.py shadow the
+standard library module, so the file is loaded by path instead.
+"""
+import importlib.util
+import pathlib
+import sys
+
+LIBRARY_PATH = pathlib.Path(__file__).resolve().parent.parent / "custom_components" / "ict_automation" / "ict_library.py"
+
+def load():
+    module = sys.modules.get("ict_library")
+    if module is not None: return module
+    spec = importlib.util.spec_from_file_location("ict_library", LIBRARY_PATH)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules["ict_library"] = module
+    spec.loader.exec_module(module)
+    return module
@@ -0,0 +1,185 @@
+"""Offline benchmarks of the ICTClient hot paths, with JSON output for regression checks.
+
+Stream benchmarks feed scripted packets straight into the client; session benchmarks run
+against the in-process simulator over loopback TCP.
+
+    python tools/ict_benchmark.py --output bench.json
+    python tools/ict_benchmark.py --compare bench.json --tolerance 0.25
+"""
+import argparse
+import asyncio
+import json
+import platform
+import random
+import statistics
+import sys
+import time
+
+from _library import load
+from ict_simulator import ICTSimulator, frame
+
+ict = load()
+
+def _input_record(idx, state=0):
+    body = bytearray(20)
+    ict.RECORD_DECODERS[0x04][0].pack_into(body, 0, idx, state, 0)
+    return bytes((0x00, 0x04, len(body))) + body
+
+def _result(value, unit, better, **extra):
+    return {"value": value, "unit": unit, "better": better, **extra}
+
+def _timed(fn, repeat):
+    """Best of `repeat` runs of fn(), in seconds."""
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+def bench_frame_throughput(size, repeat):
+    """Inbound stream through ICTFramer and ICTClient._handle_packet, in socket-read sized chunks."""
+    client = ict.ICTClient("127.0.0.1", 0, "1234")
+    stream = b"".join(frame(0x01, _input_record(i % 1000 + 1, i & 1) + b'\xff\xff') for i in range(size))
+    chunks = [stream[i:i + 4096] for i in range(0, len(stream), 4096)]
+
+    def run():
+        framer = ict.ICTFramer(client._handle_packet)
+        for chunk in chunks: framer.feed(chunk)
+
+    return _result(size / _timed(run, repeat), "frames/s", "higher", frames=size)
+
+def bench_record_decode(size, repeat):
+    """Multi-record data packets through _parse_data_stream and _notify_update."""
+    client = ict.ICTClient("127.0.0.1", 0, "1234")
+    per_frame = 10
+    packets = [frame(0x01, b"".join(_input_record((n + i) % 1000 + 1, (n + i) & 1) for i in range(per_frame)) + b'\xff\xff')
+               for n in range(0, size, per_frame)]
+
+    def run():
+        for packet in packets: client._parse_data_stream(packet, 6, len(packet) - 1)
+
+    return _result(len(packets) * per_frame / _timed(run, repeat), "records/s", "higher", records=len(packets) * per_frame)
+
+def bench_fanout(entities, updates, repeat):
+    """Cost of one pushed update as the number of subscribed entities grows."""
+    results = {}
+    for count in entities:
+        client = ict.ICTClient("127.0.0.1", 0, "1234")
+        # Every entity listens on its own point, like the platforms do
+        for idx in range(1, count + 1): client.subscribe("input", idx, lambda update: None)
+        rng = random.Random(1)
+        packets = [frame(0x01, _input_record(rng.randint(1, count), n & 1) + b'\xff\xff') for n in range(updates)]
+
+        def run():
+            for packet in packets: client._parse_data_stream(packet, 6, len(packet) - 1)
+
+        results[str(count)] = _timed(run, repeat) / updates * 1e6
+    largest = str(entities[-1])
+    return _result(results[largest], "us/update", "lower", by_entities=results)
+
+async def bench_subscribe(points):
+    """Connect to time-fully-subscribed, through login and batched _update_monitoring."""
+    sim = ICTSimulator(inputs=points, seed=1)
+    port = await sim.start()
+    client = ict.ICTClient("127.0.0.1", port, "1234")
+    client.set_configuration([], [], range(1, points + 1), [])
+    try:
+        await client.start()
+        while not client.metrics.subscription.count: await asyncio.sleep(0.01)
+        return _result(client.metrics.subscription.last, "s", "lower", monitored=len(client.monitored_items))
+    finally:
+        await client.stop()
+        await sim.stop()
+
+async def bench_command_latency(commands):
+    """End-to-end send_command round trips: queue, session, send and ACK."""
+    sim = ICTSimulator(outputs=50, seed=1)
+    port = await sim.start()
+    client = ict.ICTClient("127.0.0.1", port, "1234")
+    client.set_configuration([], [], [], range(1, 51))
+    try:
+        await client.start()
+        while not client.metrics.subscription.count: await asyncio.sleep(0.01)
+        samples = []
+        for n in range(commands):
+            started = time.perf_counter()
+            if not await client.send_command(0x03, n & 1, n % 50 + 1): raise RuntimeError("command rejected")
+            samples.append(time.perf_counter() - started)
+        samples.sort()
+        return _result(statistics.median(samples) * 1000, "ms", "lower",
+                       p95=samples[int(len(samples) * 0.95)] * 1000, commands=commands)
+    finally:
+        await client.stop()
+        await sim.stop()
+
+async def bench_scan(limit, present):
+    """Options-flow scan: discover() over 1..limit with `present` inputs configured on the panel."""
+    sim = ICTSimulator(inputs=present, seed=1)
+    port = await sim.start()
+    client = ict.ICTClient("127.0.0.1", port, "1234")
+    try:
+        if not await client.start_temp_connection() or not await client.authenticate(): raise RuntimeError("login failed")
+        started = time.perf_counter()
+        found = await client.discover(0x04, range(1, limit + 1))
+        elapsed = time.perf_counter() - started
+        if len(found) != min(limit, present): raise RuntimeError(f"scan found {len(found)} of {present}")
+        return _result(elapsed, "s", "lower", probed=limit, found=len(found))
+    finally:
+        await client.stop()
+        await sim.stop()
+
+def run_all(quick):
+    scale = 10 if quick else 1
+    repeat = 3 if quick else 5
+    results = {
+        "frame_throughput": bench_frame_throughput(100000 // scale, repeat),
+        "record_decode": bench_record_decode(100000 // scale, repeat),
+        "callback_fanout": bench_fanout(sorted({10, 100, 1000, 10000 // scale}), 20000 // scale, repeat),
+    }
+    results["subscribe_time"] = asyncio.run(bench_subscribe(5000 // scale))
+    results["command_latency"] = asyncio.run(bench_command_latency(500 // scale))
+    results["scan_time"] = asyncio.run(bench_scan(1000 // scale, 600 // scale))
+    return results
+
+def compare(results, baseline, tolerance):
+    """Names of benchmarks more than `tolerance` worse than the baseline."""
+    regressions = []
+    for name, result in results.items():
+        previous = baseline.get("results", {}).get(name)
+        if not previous or not previous.get("value"): continue
+        ratio = result["value"] / previous["value"]
+        if (ratio < 1 - tolerance) if result["better"] == "higher" else (ratio > 1 + tolerance): regressions.append(name)
+        result["baseline"] = previous["value"]
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--quick", action="store_true", help="run at a tenth of the default sizes")
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    parser.add_argument("--compare", help="baseline JSON report; exit 1 if any benchmark regressed")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed relative slowdown against the baseline")
+    args = parser.parse_args()
+
+    report = {
+        "timestamp": time.time(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "quick": args.quick,
+        "results": run_all(args.quick),
+    }
+    regressions = []
+    if args.compare:
+        with open(args.compare) as f: regressions = compare(report["results"], json.load(f), args.tolerance)
+        report["regressions"] = regressions
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f: f.write(text + "\n")
+    else: print(text)
+    for name in regressions:
+        print(f"REGRESSION {name}: {report['results'][name]['value']:.4g} vs baseline {report['results'][name]['baseline']:.4g}", file=sys.stderr)
+    sys.exit(1 if regressions else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""Replay an ICTClient capture through the framer and decoder.
+
+Inbound traffic is fed, chunk by chunk as it was read off the socket, into a client that has
+no connection, so decoding, state tracking and listener dispatch run exactly as live.
+Pass rotated files oldest first.
+
+    python tools/ict_replay.py ict_capture.bin.1 ict_capture.bin
+    python tools/ict_replay.py ict_capture.bin --speed 1 --states
+    python tools/ict_replay.py ict_capture.bin --profile
+"""
+import argparse
+import asyncio
+import cProfile
+import itertools
+import json
+import pstats
+import sys
+import time
+
+from _library import load
+
+ict = load()
+
+def _records(paths):
+    return itertools.chain.from_iterable(ict.read_capture(path) for path in paths)
+
+def summarize(paths):
+    """Counts of a capture without replaying it."""
+    summary = {"records": 0, "bytes_in": 0, "frames_out": 0, "commands": {}, "first": None, "last": None}
+    for at, direction, data in _records(paths):
+        summary["records"] += 1
+        if summary["first"] is None: summary["first"] = at
+        summary["last"] = at
+        if direction == ict.CAPTURE_IN:
+            summary["bytes_in"] += len(data)
+        elif len(data) >= 8:
+            summary["frames_out"] += 1
+            key = f"{data[6]:#04x}/{data[7]:#04x}"
+            summary["commands"][key] = summary["commands"].get(key, 0) + 1
+    return summary
+
+async def replay(paths, speed):
+    client = ict.ICTClient("replay", 0, "")
+    started = time.perf_counter()
+    framer = await ict.replay_capture(_records(paths), client._handle_packet, speed)
+    elapsed = time.perf_counter() - started
+    return client, {
+        "elapsed": elapsed,
+        "frames": framer.packets,
+        "records": client.metrics.records,
+        "checksum_errors": framer.checksum_errors,
+        "resyncs": framer.resyncs,
+        "points": len(client.states),
+        "frames_per_second": framer.packets / elapsed if elapsed else None,
+        "records_per_second": client.metrics.records / elapsed if elapsed else None,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("paths", nargs="+", help="capture files, oldest first")
+    parser.add_argument("--speed", type=float, default=0, help="1 for real time, 2 for double speed; 0 (default) runs flat out")
+    parser.add_argument("--states", action="store_true", help="include the final state of every point")
+    parser.add_argument("--profile", action="store_true", help="print the top functions by cumulative time to stderr")
+    args = parser.parse_args()
+
+    profiler = cProfile.Profile() if args.profile else None
+    if profiler: profiler.enable()
+    client, result = asyncio.run(replay(args.paths, args.speed or None))
+    if profiler:
+        profiler.disable()
+        pstats.Stats(profiler, stream=sys.stderr).sort_stats("cumulative").print_stats(25)
+
+    report = {"capture": summarize(args.paths), "replay": result}
+    if args.states: report["states"] = sorted([update.type, *update] for _, update in client.states.items())
+    print(json.dumps(report, indent=2))
+
+if __name__ == "__main__":
+    main()
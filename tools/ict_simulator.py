@@ -0,0 +1,262 @@
+"""Stand-in for a Protege controller's automation service, for testing ICTClient without hardware.
+
+Answers login, logout, monitor, status queries and door/area/output/input commands, and
+pushes PKT_TYPE_DATA records to subscribed connections when points change. Replies can be
+delayed, jittered, split into fragments and corrupted to exercise the client's framing and
+timeout handling.
+
+    python tools/ict_simulator.py --inputs 4000 --outputs 500 --latency 20 --jitter 10 --churn 50
+"""
+import argparse
+import asyncio
+import logging
+import random
+import socket
+import struct
+import time
+
+from _library import load
+
+ict = load()
+
+_LOGGER = logging.getLogger("ict_simulator")
+
+ACK = b'\xff\x00'
+NAK = b'\xff\xff'
+# Status records are padded to the panel's usual body length
+RECORD_BODY = 20
+# Initial field values of each record type, in RECORD_DECODERS layout order after the index
+INITIAL_FIELDS = {0x01: (0, 0), 0x02: (0, 0), 0x03: (0,), 0x04: (0, 0), 0x06: (0,)}
+
+def frame(packet_type, body):
+    """Build any packet: header, body and the trailing 8-bit sum."""
+    packet = bytearray(b'IC') + struct.pack('<H', len(body) + 7) + bytes((packet_type, 0x00)) + body
+    packet.append(sum(packet) & 0xFF)
+    return bytes(packet)
+
+class ICTSimulator:
+    """In-process simulated controller. `start()` returns the port it listens on.
+
+    latency and jitter are in seconds; each reply is delayed by latency plus a uniform
+    random share of jitter, never overtaking an earlier one. fragment > 0 writes every
+    packet in random chunks of at most that many bytes, and corrupt is the chance of
+    flipping one byte of a packet. batch_monitoring=False NAKs multi-record monitor
+    requests like older firmware, and acks=False stays silent where the panel would ACK,
+    like one without "Ack Commands". `users` are extra PINs allowed to log in.
+    """
+    def __init__(self, doors=0, areas=0, inputs=0, outputs=0, pin="1234", latency=0.0, jitter=0.0,
+                 fragment=0, corrupt=0.0, churn=0.0, batch_monitoring=True, acks=True, users=(), seed=None):
+        self.points = {}
+        for type_h, count in ((0x01, doors), (0x02, areas), (0x03, outputs), (0x04, inputs), (0x06, inputs)):
+            self.points[type_h] = {idx: list(INITIAL_FIELDS[type_h]) for idx in range(1, count + 1)}
+        self.pins = [[int(c) for c in str(p)] for p in (pin, *users)]
+        self.latency = latency
+        self.jitter = jitter
+        self.fragment = fragment
+        self.corrupt = corrupt
+        self.churn = churn
+        self.batch_monitoring = batch_monitoring
+        self.acks = acks
+        self.random = random.Random(seed)
+        self.sessions = set()
+        self.stats = {"frames_in": 0, "frames_out": 0, "pushes": 0, "corrupted": 0, "nak": 0, "commands": {}}
+        self._server = None
+        self._churn_task = None
+
+    async def start(self, host="127.0.0.1", port=0):
+        self._server = await asyncio.start_server(self._accept, host, port)
+        if self.churn > 0: self._churn_task = asyncio.create_task(self._churn_loop())
+        return self._server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        if self._churn_task: self._churn_task.cancel()
+        for session in list(self.sessions): session.close()
+        if self._server:
+            self._server.close()
+            await self._server.wait_closed()
+
+    def record(self, type_h, idx):
+        layout = ict.RECORD_DECODERS[type_h][0]
+        body = bytearray(RECORD_BODY)
+        layout.pack_into(body, 0, idx, *self.points[type_h][idx])
+        return bytes((0x00, type_h, RECORD_BODY)) + body
+
+    def set_point(self, type_h, idx, *fields):
+        """Change a point's raw record fields and push it to every connection monitoring it."""
+        self.points[type_h][idx] = list(fields)
+        record = self.record(type_h, idx)
+        for session in self.sessions:
+            if (type_h, idx) in session.subscribed:
+                self.stats["pushes"] += 1
+                session.send(0x01, record + b'\xff\xff')
+
+    async def _accept(self, reader, writer):
+        session = _Session(self, writer)
+        self.sessions.add(session)
+        try:
+            while True:
+                data = await reader.read(65536)
+                if not data: break
+                session.framer.feed(data)
+        # Cancelled when the event loop shuts down under a still-connected client
+        except (ConnectionError, asyncio.CancelledError): pass
+        finally:
+            self.sessions.discard(session)
+            session.close()
+
+    async def _churn_loop(self):
+        """Toggle random inputs open and closed at `churn` changes per second."""
+        inputs = list(self.points[0x04])
+        if not inputs: return
+        while True:
+            await asyncio.sleep(self.random.expovariate(self.churn))
+            idx = self.random.choice(inputs)
+            state, flags = self.points[0x04][idx]
+            self.set_point(0x04, idx, 0 if state else 1, flags)
+
+    def handle(self, session, group, sub, data):
+        """Answer one command packet. Returns the reply bodies as (packet type, body) pairs."""
+        key = f"{group:#04x}/{sub:#04x}"
+        self.stats["commands"][key] = self.stats["commands"].get(key, 0) + 1
+        if group == 0x00:
+            if sub == 0x00: return [(0xC0, ACK)]
+            if sub == 0x02:
+                digits = [d for d in data if d != 0xFF]
+                session.logged_in = digits in self.pins
+                return [(0xC0, ACK if session.logged_in else NAK)]
+            if sub == 0x03:
+                session.logged_in = False
+                session.subscribed.clear()
+                return [(0xC0, ACK)]
+            if sub == 0x05: return [(0xC0, self._monitor(session, data))]
+            return [(0xC0, NAK)]
+        if len(data) < 4 or group not in self.points: return [(0xC0, NAK)]
+        idx = struct.unpack_from('<I', data)[0]
+        if idx not in self.points[group]: return [(0xC0, NAK)]
+        if sub == 0x80: return [(0x01, self.record(group, idx) + b'\xff\xff')]
+        if not session.logged_in: return [(0xC0, NAK)]
+        fields = self._command(group, sub, self.points[group][idx])
+        if fields is None: return [(0xC0, NAK)]
+        # The ACK goes first, then the new state reaches whoever monitors the point
+        self.points[group][idx] = fields
+        session.send(0xC0, ACK)
+        self.set_point(group, idx, *fields)
+        return []
+
+    def _monitor(self, session, data):
+        size = ict.MONITOR_RECORD.size
+        if not session.logged_in or len(data) % size or not data: return NAK
+        if len(data) > size and not self.batch_monitoring: return NAK
+        items = [ict.MONITOR_RECORD.unpack_from(data, offset)[:3] for offset in range(0, len(data), size)]
+        if any(idx not in self.points.get(type_l, {}) for type_l, _, idx in items): return NAK
+        session.subscribed.update((type_l, idx) for type_l, _, idx in items)
+        return ACK
+
+    @staticmethod
+    def _command(group, sub, fields):
+        """New raw fields for a command, or None if the panel would refuse it."""
+        if group == 0x01 and sub in (0x00, 0x01, 0x02): return [0 if sub == 0x00 else 1, fields[1]]
+        if group == 0x02 and sub in (0x01, 0x02, 0x03, 0x04): return [0 if sub == 0x02 else 0x80 | sub, fields[1]]
+        if group == 0x03 and sub in (0x00, 0x01): return [sub]
+        if group == 0x04 and sub in (0x00, 0x01, 0x02): return [fields[0], 0 if sub == 0x00 else 1]
+        return None
+
+class _Session:
+    """One client connection: its login, subscriptions and delayed, impaired reply stream."""
+    def __init__(self, sim, writer):
+        self.sim = sim
+        self.writer = writer
+        self.logged_in = False
+        self.subscribed = set()
+        self.framer = ict.ICTFramer(self._on_packet)
+        self._queue = asyncio.Queue()
+        self._last_due = 0.0
+        self._writer_task = asyncio.create_task(self._write_loop())
+        sock = writer.get_extra_info('socket')
+        if sock is not None and sim.fragment: sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    def _on_packet(self, packet):
+        self.sim.stats["frames_in"] += 1
+        if packet[4] != ict.PKT_TYPE_COMMAND or len(packet) < 9: return
+        for packet_type, body in self.sim.handle(self, packet[6], packet[7], bytes(packet[8:-1])):
+            self.send(packet_type, body)
+
+    def send(self, packet_type, body):
+        sim = self.sim
+        if body == NAK: sim.stats["nak"] += 1
+        if body == ACK and not sim.acks: return
+        due = time.monotonic() + sim.latency + (sim.random.uniform(0, sim.jitter) if sim.jitter else 0.0)
+        # TCP keeps order, so a reply never overtakes an earlier one
+        self._last_due = max(due, self._last_due)
+        self._queue.put_nowait((self._last_due, frame(packet_type, body)))
+
+    async def _write_loop(self):
+        sim = self.sim
+        try:
+            while True:
+                due, data = await self._queue.get()
+                delay = due - time.monotonic()
+                if delay > 0: await asyncio.sleep(delay)
+                if sim.corrupt and sim.random.random() < sim.corrupt:
+                    data = bytearray(data)
+                    data[sim.random.randrange(len(data))] ^= 0xFF
+                    sim.stats["corrupted"] += 1
+                sim.stats["frames_out"] += 1
+                if not sim.fragment:
+                    self.writer.write(data)
+                    if self._queue.empty(): await self.writer.drain()
+                    continue
+                pos = 0
+                while pos < len(data):
+                    size = sim.random.randint(1, sim.fragment)
+                    self.writer.write(data[pos:pos + size])
+                    await self.writer.drain()
+                    # Yield so each fragment goes out as its own segment
+                    await asyncio.sleep(0)
+                    pos += size
+        except (ConnectionError, asyncio.CancelledError): pass
+
+    def close(self):
+        self._writer_task.cancel()
+        self.writer.close()
+
+async def _main(args):
+    sim = ICTSimulator(
+        doors=args.doors, areas=args.areas, inputs=args.inputs, outputs=args.outputs, pin=args.pin,
+        latency=args.latency / 1000, jitter=args.jitter / 1000, fragment=args.fragment, corrupt=args.corrupt,
+        churn=args.churn, batch_monitoring=not args.single_monitor, acks=not args.no_acks, users=args.user, seed=args.seed,
+    )
+    port = await sim.start(args.host, args.port)
+    _LOGGER.info(f"Simulating {args.doors} doors, {args.areas} areas, {args.inputs} inputs, {args.outputs} outputs on {args.host}:{port}")
+    try:
+        while True:
+            await asyncio.sleep(10)
+            _LOGGER.info(f"{len(sim.sessions)} sessions, {sim.stats['frames_in']} frames in, {sim.stats['frames_out']} out, {sim.stats['pushes']} pushes")
+    finally:
+        await sim.stop()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=21000)
+    parser.add_argument("--pin", default="1234", help="service PIN to accept")
+    parser.add_argument("--doors", type=int, default=20)
+    parser.add_argument("--areas", type=int, default=10)
+    parser.add_argument("--inputs", type=int, default=100)
+    parser.add_argument("--outputs", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.0, help="reply delay in ms")
+    parser.add_argument("--jitter", type=float, default=0.0, help="extra random reply delay of up to this many ms")
+    parser.add_argument("--fragment", type=int, default=0, help="write packets in chunks of at most this many bytes")
+    parser.add_argument("--corrupt", type=float, default=0.0, help="probability of corrupting a packet")
+    parser.add_argument("--churn", type=float, default=0.0, help="random input changes pushed per second")
+    parser.add_argument("--single-monitor", action="store_true", help="reject multi-record monitor requests")
+    parser.add_argument("--no-acks", action="store_true", help="never ACK, like a panel without \"Ack Commands\"")
+    parser.add_argument("--user", action="append", default=[], help="extra user PIN to accept; repeatable")
+    parser.add_argument("--seed", type=int)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s")
+    try: asyncio.run(_main(args))
+    except KeyboardInterrupt: pass
+
+if __name__ == "__main__":
+    main()